@@ -3,11 +3,14 @@ Additional Free Music APIs
 Enhances recommendations with more data sources
 """
 
-import requests
 from typing import Optional, Dict, List
 import logging
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from http_session import create_session, loads_json, CircuitBreaker
+from lookup_cache import TTLCache, normalize_key, MISSING
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -23,25 +26,43 @@ class GeniusClient:
     """
     BASE_URL = "https://api.genius.com"
     
+    # Simple mood detection from common words
+    MOOD_INDICATORS = {
+        'happy': ('happy', 'joy', 'love', 'celebration', 'party', 'dance'),
+        'sad': ('sad', 'lonely', 'heartbreak', 'tears', 'miss', 'goodbye'),
+        'energetic': ('energy', 'power', 'rock', 'pump', 'hype', 'wild'),
+        'chill': ('chill', 'relax', 'calm', 'smooth', 'mellow', 'easy'),
+        'angry': ('angry', 'rage', 'fight', 'hate', 'mad', 'fury')
+    }
+    
+    # One alternation per mood, compiled once (plain substring match, same as `keyword in text`)
+    MOOD_PATTERNS = {
+        mood: re.compile('|'.join(map(re.escape, keywords)))
+        for mood, keywords in MOOD_INDICATORS.items()
+    }
+    
     def __init__(self):
         self.access_token = os.getenv('GENIUS_ACCESS_TOKEN')
+        self.session = create_session(
+            headers={'Authorization': f'Bearer {self.access_token}'} if self.access_token else None
+        )
+        self.breaker = CircuitBreaker('Genius')
     
     def search_song(self, artist: str, track: str) -> Optional[Dict]:
         """Search for song and analyze lyrics themes"""
-        if not self.access_token:
+        if not self.access_token or not self.breaker.allow():
             return None
         
         try:
-            headers = {'Authorization': f'Bearer {self.access_token}'}
-            response = requests.get(
+            response = self.breaker.get(
+                self.session,
                 f"{self.BASE_URL}/search",
-                headers=headers,
                 params={'q': f'{track} {artist}'},
                 timeout=5
             )
             
             if response.status_code == 200:
-                data = response.json()
+                data = loads_json(response)
                 if data.get('response', {}).get('hits'):
                     hit = data['response']['hits'][0]
                     result = hit['result']
@@ -55,19 +76,12 @@ class GeniusClient:
                     title_lower = result.get('title', '').lower()
                     lyrics_state = result.get('lyrics_state', '')
                     
-                    # Simple mood detection from common words
-                    mood_indicators = {
-                        'happy': ['happy', 'joy', 'love', 'celebration', 'party', 'dance'],
-                        'sad': ['sad', 'lonely', 'heartbreak', 'tears', 'miss', 'goodbye'],
-                        'energetic': ['energy', 'power', 'rock', 'pump', 'hype', 'wild'],
-                        'chill': ['chill', 'relax', 'calm', 'smooth', 'mellow', 'easy'],
-                        'angry': ['angry', 'rage', 'fight', 'hate', 'mad', 'fury']
-                    }
-                    
-                    detected_moods = []
-                    for mood, keywords in mood_indicators.items():
-                        if any(keyword in title_lower or keyword in ' '.join(tags) for keyword in keywords):
-                            detected_moods.append(mood)
+                    # Scan title + tags once per mood; newline keeps keywords from matching across fields
+                    haystack = '\n'.join([title_lower, ' '.join(tags)])
+                    detected_moods = [
+                        mood for mood, pattern in self.MOOD_PATTERNS.items()
+                        if pattern.search(haystack)
+                    ]
                     
                     return {
                         'tags': tags,
@@ -91,21 +105,22 @@ class DiscogsClient:
     def __init__(self):
         self.token = os.getenv('DISCOGS_TOKEN')
         self.user_agent = 'MusicSwipeApp/1.0'
+        
+        headers = {'User-Agent': self.user_agent}
+        if self.token:
+            headers['Authorization'] = f'Discogs token={self.token}'
+        self.session = create_session(headers=headers)
+        self.breaker = CircuitBreaker('Discogs')
     
     def search_release(self, artist: str, track: str) -> Optional[Dict]:
         """Search for release and get detailed genre/style info"""
-        if not self.token:
+        if not self.token or not self.breaker.allow():
             return None
         
         try:
-            headers = {
-                'Authorization': f'Discogs token={self.token}',
-                'User-Agent': self.user_agent
-            }
-            
-            response = requests.get(
+            response = self.breaker.get(
+                self.session,
                 f"{self.BASE_URL}/database/search",
-                headers=headers,
                 params={
                     'q': f'{artist} {track}',
                     'type': 'release',
@@ -115,7 +130,7 @@ class DiscogsClient:
             )
             
             if response.status_code == 200:
-                data = response.json()
+                data = loads_json(response)
                 if data.get('results'):
                     result = data['results'][0]
                     
@@ -143,60 +158,75 @@ class DiscogsClient:
 genius_client = GeniusClient()
 discogs_client = DiscogsClient()
 
+# Tokens are read once at client init; without either there is nothing to look up
+_ANY_KEYS = bool(genius_client.access_token or discogs_client.token)
+
+# Same tracks get looked up again and again across users/sessions - keep results for a day
+_metadata_cache = TTLCache(maxsize=4096, ttl=86400)
+# Empty results are kept only briefly - the clients return None for timeouts, errors and
+# open breakers too, so an empty answer may just be a transient outage
+_EMPTY_TTL = 300
+
+# Shared worker pool for the Genius/Discogs fan-out (no per-call thread spin-up/teardown)
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='enhanced-metadata')
+
 
 def get_enhanced_metadata(artist: str, track: str) -> Dict:
     """
     Fetch metadata from FREE additional APIs in parallel
     Returns combined mood, style, and genre tags from Genius and Discogs
+    Results are cached per (artist, track), ignoring case/accents/punctuation
     """
-    from concurrent.futures import ThreadPoolExecutor
+    if not _ANY_KEYS:
+        return {'enhanced_tags': [], 'moods': [], 'styles': [], 'additional_genres': []}
+    
+    cache_key = normalize_key(artist, track)
+    cached = _metadata_cache.get(cache_key)
+    if cached is not MISSING:
+        return {key: list(value) for key, value in cached.items()}
     
+    metadata = _fetch_enhanced_metadata(artist, track)
+    _metadata_cache.set(cache_key, metadata, ttl=None if metadata['enhanced_tags'] else _EMPTY_TTL)
+    return {key: list(value) for key, value in metadata.items()}
+
+
+def _fetch_enhanced_metadata(artist: str, track: str) -> Dict:
+    """Uncached lookup against Genius and Discogs"""
+    # Insertion-ordered dicts double as ordered sets - dedup happens as we collect
     results = {
-        'moods': [],
-        'styles': [],
-        'genres': [],
-        'tags': []
+        'moods': {},
+        'styles': {},
+        'genres': {},
+        'tags': {}
     }
     
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        futures = {
-            'genius': executor.submit(genius_client.search_song, artist, track),
-            'discogs': executor.submit(discogs_client.search_release, artist, track)
-        }
-        
-        for source, future in futures.items():
-            try:
-                data = future.result(timeout=5)
-                if data:
-                    logger.info(f"✅ Got metadata from {source}")
-                    
-                    # Combine all tags
-                    if 'moods' in data:
-                        results['moods'].extend(data['moods'])
-                    if 'styles' in data:
-                        results['styles'].extend(data['styles'])
-                    if 'genres' in data:
-                        results['genres'].extend(data['genres'])
-                    if 'tags' in data:
-                        results['tags'].extend(data['tags'])
-            except Exception as e:
-                logger.debug(f"Failed to get metadata from {source}: {e}")
+    # Not a `with` block: a timed-out lookup must not hold up the caller while it finishes
+    futures = {
+        'genius': _executor.submit(genius_client.search_song, artist, track),
+        'discogs': _executor.submit(discogs_client.search_release, artist, track)
+    }
     
-    # Remove duplicates
-    results['moods'] = list(set(results['moods']))
-    results['styles'] = list(set(results['styles']))
-    results['genres'] = list(set(results['genres']))
-    results['tags'] = list(set(results['tags']))
+    for source, future in futures.items():
+        try:
+            data = future.result(timeout=5)
+            if data:
+                logger.info(f"✅ Got metadata from {source}")
+                
+                # Combine all tags
+                for key, collected in results.items():
+                    if key in data:
+                        collected.update(dict.fromkeys(data[key]))
+        except Exception as e:
+            logger.debug(f"Failed to get metadata from {source}: {e}")
     
-    # Combine all as additional tags for similarity matching
-    all_tags = results['moods'] + results['styles'] + results['genres'] + results['tags']
+    # Combine all as additional tags for similarity matching (deduplicated, first-seen order)
+    all_tags = list({**results['moods'], **results['styles'], **results['genres'], **results['tags']})
     
     logger.info(f"✅ Enhanced metadata: {len(all_tags)} total tags from multiple sources")
     
     return {
-        'enhanced_tags': list(set(all_tags)),  # Deduplicated
-        'moods': results['moods'],
-        'styles': results['styles'],
-        'additional_genres': results['genres']
+        'enhanced_tags': all_tags,
+        'moods': list(results['moods']),
+        'styles': list(results['styles']),
+        'additional_genres': list(results['genres'])
     }
-
@@ -5,61 +5,227 @@ Analyzes actual audio files to extract features similar to Spotify
 
 import librosa
 import numpy as np
-import requests
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple, Union, BinaryIO
+from math import gcd
+import io
+import os
+from functools import lru_cache
+from scipy.fft import dct, rfft
 import tempfile
 import logging
+from http_session import create_session
 
 logger = logging.getLogger(__name__)
 
+# Numba is optional - when installed, the framing loops below are JIT-compiled
+NUMBA_AVAILABLE = False
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    pass
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True)
+    def _rms_zcr_kernel(y, frame_length, hop_length):
+        """
+        RMS and zero-crossing rate for centered frames in one fused pass over y
+        RMS zero-pads the edges and ZCR edge-pads them, matching librosa
+        """
+        n = y.shape[0]
+        half = frame_length // 2
+        n_frames = 1 + n // hop_length
+        rms = np.empty(n_frames, dtype=np.float32)
+        zcr = np.empty(n_frames, dtype=np.float32)
+        
+        for f in range(n_frames):
+            start = f * hop_length - half
+            sum_sq = 0.0
+            crossings = 0
+            prev_negative = y[min(max(start, 0), n - 1)] < 0
+            
+            for i in range(start, start + frame_length):
+                if 0 <= i < n:
+                    sum_sq += y[i] * y[i]
+                negative = y[min(max(i, 0), n - 1)] < 0
+                if negative != prev_negative:
+                    crossings += 1
+                prev_negative = negative
+            
+            rms[f] = np.sqrt(sum_sq / frame_length)
+            zcr[f] = crossings / frame_length
+        
+        return rms, zcr
+
+
+# Keep-alive session for preview downloads (previews all come from the same few CDN hosts)
+_preview_session = create_session()
+
+
+@lru_cache(maxsize=4)
+def _hann_window(n_fft: int) -> np.ndarray:
+    """Periodic Hann window (as librosa uses) in float32"""
+    return np.hanning(n_fft + 1)[:-1].astype(np.float32)
+
+
+@lru_cache(maxsize=4)
+def _mel_basis(sr: int, n_fft: int) -> np.ndarray:
+    """Mel filterbank (128 bands), built once per (sr, n_fft)"""
+    return librosa.filters.mel(sr=sr, n_fft=n_fft, dtype=np.float32)
+
+
+@lru_cache(maxsize=4)
+def _chroma_basis(sr: int, n_fft: int) -> np.ndarray:
+    """Chroma filterbank (12 pitch classes), built once per (sr, n_fft)"""
+    return librosa.filters.chroma(sr=sr, n_fft=n_fft, dtype=np.float32)
+
 
 class AudioAnalyzer:
     """Extract audio features from audio files using Librosa"""
     
+    SAMPLE_RATE = 22050      # Rate all features are computed at (librosa's default)
+    PREVIEW_DURATION = 30    # Previews are 30 second clips
+    N_FFT = 2048             # Frame length for STFT / RMS / ZCR (librosa defaults)
+    HOP_LENGTH = 512
+    
     @staticmethod
-    def download_preview(preview_url: str) -> Optional[str]:
-        """Download audio preview to temporary file"""
+    def download_preview(preview_url: str) -> Optional[io.BytesIO]:
+        """
+        Download audio preview into memory (previews are ~1 MB, no need to touch disk)
+        Streams into a single buffer preallocated from Content-Length instead of growing one
+        """
         try:
-            response = requests.get(preview_url, timeout=10)
-            if response.status_code == 200:
-                # Save to temporary file
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3')
-                temp_file.write(response.content)
-                temp_file.close()
-                return temp_file.name
-            return None
+            with _preview_session.get(preview_url, stream=True, timeout=10) as response:
+                if response.status_code != 200:
+                    return None
+                
+                expected = int(response.headers.get('Content-Length') or 0)
+                buffer = bytearray(expected)
+                view = memoryview(buffer)
+                offset = 0
+                
+                for chunk in response.iter_content(chunk_size=65536):
+                    end = offset + len(chunk)
+                    if end > len(buffer):
+                        # Missing/wrong Content-Length - fall back to growing the buffer
+                        view.release()
+                        buffer.extend(bytes(end - len(buffer)))
+                        view = memoryview(buffer)
+                    view[offset:end] = chunk
+                    offset = end
+                
+                view.release()
+                del buffer[offset:]
+                return io.BytesIO(buffer)
         except Exception as e:
             logger.error(f"Error downloading preview: {e}")
             return None
     
-    @staticmethod
-    def extract_features(audio_path: str) -> Optional[Dict]:
+    @classmethod
+    def load_audio(cls, audio: Union[str, BinaryIO]) -> Tuple[np.ndarray, int]:
+        """
+        Decode audio (file path or in-memory file object) to mono at SAMPLE_RATE
+        Reads directly through libsndfile (MP3 supported from libsndfile 1.1) and resamples
+        with a polyphase filter; falls back to librosa.load for anything soundfile can't decode
         """
-        Extract audio features from file
+        try:
+            import soundfile as sf
+            from scipy.signal import resample_poly
+            
+            with sf.SoundFile(audio) as audio_file:
+                native_sr = audio_file.samplerate
+                y = audio_file.read(
+                    frames=int(cls.PREVIEW_DURATION * native_sr),
+                    dtype='float32',
+                    always_2d=True
+                )
+            
+            # Downmix to mono
+            y = y.mean(axis=1)
+            
+            if native_sr != cls.SAMPLE_RATE:
+                factor = gcd(cls.SAMPLE_RATE, native_sr)
+                y = resample_poly(y, cls.SAMPLE_RATE // factor, native_sr // factor)
+            
+            return y.astype(np.float32, copy=False), cls.SAMPLE_RATE
+        except (ImportError, RuntimeError) as e:
+            # soundfile raises LibsndfileError (a RuntimeError) for formats it can't decode
+            logger.debug(f"soundfile decode unavailable, falling back to librosa.load: {e}")
+            return cls._load_with_librosa(audio)
+    
+    @classmethod
+    def _load_with_librosa(cls, audio: Union[str, BinaryIO]) -> Tuple[np.ndarray, int]:
+        """librosa.load fallback - its audioread backend needs a real file, so spill buffers to disk"""
+        if isinstance(audio, str):
+            return librosa.load(audio, sr=cls.SAMPLE_RATE, duration=cls.PREVIEW_DURATION, dtype=np.float32)
+        
+        audio.seek(0)
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3')
+        try:
+            temp_file.write(audio.read())
+            temp_file.close()
+            return librosa.load(temp_file.name, sr=cls.SAMPLE_RATE, duration=cls.PREVIEW_DURATION, dtype=np.float32)
+        finally:
+            os.unlink(temp_file.name)
+    
+    @classmethod
+    def _frame(cls, y: np.ndarray, pad_mode: str = 'constant') -> np.ndarray:
+        """Centered, overlapping frames of shape (n_frames, N_FFT) - a strided view, no copy"""
+        padded = np.pad(y, cls.N_FFT // 2, mode=pad_mode)
+        return np.lib.stride_tricks.sliding_window_view(padded, cls.N_FFT)[::cls.HOP_LENGTH]
+    
+    @classmethod
+    def _rms_and_zcr(cls, y: np.ndarray, frames: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-frame RMS energy and zero-crossing rate"""
+        if NUMBA_AVAILABLE:
+            return _rms_zcr_kernel(y, cls.N_FFT, cls.HOP_LENGTH)
+        
+        rms = np.sqrt(np.mean(frames ** 2, axis=1))
+        signs = np.signbit(cls._frame(y, pad_mode='edge'))
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / cls.N_FFT
+        return rms, zcr
+    
+    @classmethod
+    def extract_features(cls, audio: Union[str, BinaryIO]) -> Optional[Dict]:
+        """
+        Extract audio features from a file path or in-memory audio
         Returns Spotify-compatible feature dict
         """
         try:
             # Load audio file
-            y, sr = librosa.load(audio_path, duration=30)  # 30 second preview
+            y, sr = cls.load_audio(audio)
             
-            # Tempo and Beat
-            tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
+            # One magnitude spectrogram shared by every spectral feature below (and the beat tracker)
+            # Everything stays float32 / complex64: scipy's rfft keeps single precision where
+            # np.fft would silently promote to complex128 and double the memory traffic
+            frames = cls._frame(y)
+            window = _hann_window(cls.N_FFT)
+            S = np.abs(rfft(frames * window, axis=1)).T  # (freq_bins, n_frames)
+            power = S ** 2
             
-            # Spectral Features
-            spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
+            # Log-mel spectrogram: feeds both the onset envelope and the MFCCs
+            mel_db = 10.0 * np.log10(np.maximum(_mel_basis(sr, cls.N_FFT) @ power, 1e-10))
+            mel_db = np.maximum(mel_db, mel_db.max() - 80.0)
             
-            # Zero Crossing Rate (speech-like quality)
-            zcr = librosa.feature.zero_crossing_rate(y)[0]
+            # Tempo and Beat - pass the onset envelope so beat_track doesn't run its own STFT
+            onset_env = librosa.onset.onset_strength(S=mel_db, sr=sr)
+            tempo, beats = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, hop_length=cls.HOP_LENGTH)
+            tempo = float(np.atleast_1d(tempo)[0])  # librosa >= 0.10 returns a 1-element array
             
-            # MFCCs (timbre)
-            mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+            # Spectral Features
+            freqs = np.fft.rfftfreq(cls.N_FFT, d=1.0 / sr).astype(np.float32)
+            spectral_centroids = (freqs @ S) / np.maximum(S.sum(axis=0), 1e-10)
+            
+            # RMS Energy + Zero Crossing Rate (speech-like quality)
+            rms, zcr = cls._rms_and_zcr(y, frames)
             
-            # RMS Energy
-            rms = librosa.feature.rms(y=y)[0]
+            # MFCCs (timbre): DCT of the log-mel spectrogram, same recipe as librosa.feature.mfcc
+            mfccs = dct(mel_db, type=2, axis=0, norm='ortho')[:13]
             
-            # Chroma (key/pitch)
-            chroma = librosa.feature.chroma_stft(y=y, sr=sr)
+            # Chroma (key/pitch), normalized per frame
+            chroma = _chroma_basis(sr, cls.N_FFT) @ power
+            chroma /= np.maximum(chroma.max(axis=0), 1e-10)
             
             # Calculate features in Spotify-compatible format
             
@@ -68,7 +234,7 @@ class AudioAnalyzer:
             energy = min(1.0, max(0.0, energy * 2))  # Normalize to 0-1
             
             # Danceability: Based on beat strength and tempo
-            beat_strength = float(np.mean([beats[i+1] - beats[i] for i in range(len(beats)-1)]))
+            beat_strength = float(np.mean(np.diff(beats))) if len(beats) > 1 else 0.0
             danceability = min(1.0, max(0.0, 1 - (abs(120 - tempo) / 120)))
             
             # Valence (mood): Based on spectral features and energy
@@ -130,21 +296,12 @@ class AudioAnalyzer:
             return None
         
         # Download preview
-        audio_path = cls.download_preview(preview_url)
-        if not audio_path:
+        audio = cls.download_preview(preview_url)
+        if audio is None:
             return None
         
-        # Extract features
-        features = cls.extract_features(audio_path)
-        
-        # Clean up temp file
-        try:
-            import os
-            os.unlink(audio_path)
-        except:
-            pass
-        
-        return features
+        # Extract features (decoded straight from memory)
+        return cls.extract_features(audio)
 
 
 # Global instance
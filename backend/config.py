@@ -18,6 +18,16 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = "sqlite:///./musicapp.db"
+    database_pool_size: int = 20
+    database_max_overflow: int = 40
+    
+    # On-disk cache for external feature lookups (Deezer/MusicBrainz/AcousticBrainz) and LLM responses
+    # Shared by all worker processes and kept across restarts; empty string disables it
+    feature_cache_path: str = "./feature_cache.db"
+    
+    # Load the local Ollama model at startup instead of on the first LLM call - only worth it
+    # when LLM features are in use, since it keeps the model resident in memory
+    llm_warm_up: bool = False
     
     # JWT Secret for authentication
     jwt_secret: str = "your-secret-key-change-in-production"
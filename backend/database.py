@@ -1,17 +1,50 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, Text, DateTime, ForeignKey, JSON, Index, LargeBinary
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.engine import make_url
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from datetime import datetime
+from typing import List, Dict
+from array import array
 from config import settings
+import json
+import sys
 import logging
 
 logger = logging.getLogger(__name__)
 
 # Create database engine
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
-)
+_database_url = make_url(settings.database_url)
+_is_sqlite = _database_url.get_backend_name() == "sqlite"
+_is_memory_db = _is_sqlite and _database_url.database in (None, "", ":memory:")
+
+engine_options = {
+    "pool_pre_ping": True,  # Drop dead connections instead of failing the request
+}
+if _is_sqlite:
+    # Wait up to 30s for a write lock instead of erroring under concurrent swipes
+    engine_options["connect_args"] = {"check_same_thread": False, "timeout": 30}
+if not _is_memory_db:
+    # Default QueuePool (5 + 10 overflow) is too small for concurrent FastAPI requests
+    engine_options.update(
+        pool_size=settings.database_pool_size,
+        max_overflow=settings.database_max_overflow,
+        pool_recycle=1800
+    )
+
+engine = create_engine(settings.database_url, **engine_options)
+
+
+if _is_sqlite:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """WAL lets reads proceed during writes; NORMAL sync is safe under WAL and much faster"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA cache_size=-64000")  # 64 MB page cache
+        cursor.close()
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -20,6 +53,44 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+# Column types
+# Binary JSONB on Postgres (no re-parsing text on every read), plain JSON elsewhere
+JSONType = JSON().with_variant(JSONB(), 'postgresql')
+
+
+class PackedFloatList(TypeDecorator):
+    """
+    List of floats stored as a packed little-endian binary blob instead of JSON text
+    Layout: 1-byte array typecode followed by the raw values
+    Written as float32 (features are 0-1 scores, float64 precision buys nothing);
+    older float64 ('d') blobs still decode since the typecode travels with the data
+    """
+    impl = LargeBinary
+    cache_ok = True
+    
+    TYPECODE = 'f'
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        values = array(self.TYPECODE, value)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return self.TYPECODE.encode() + values.tobytes()
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            # Row written before this column was packed (JSON text)
+            return json.loads(value)
+        values = array(chr(value[0]))
+        values.frombytes(value[1:])
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return values.tolist()
+
+
 # Database Models
 class User(Base):
     __tablename__ = "users"
@@ -33,26 +104,31 @@ class User(Base):
 
 class SwipeHistory(Base):
     __tablename__ = "swipe_history"
+    __table_args__ = (
+        # "Most recent swipes for user X" is an index range scan, no extra sort.
+        # Its user_id prefix also serves plain user_id lookups, so no separate index for that.
+        Index('ix_swipe_user_created', 'user_id', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     song_id = Column(String, nullable=False, index=True)
     song_name = Column(String, nullable=False)
     artist_name = Column(String, nullable=False)
     direction = Column(String, nullable=False)  # 'left' or 'right'
-    audio_features = Column(JSON, nullable=True)
-    track_metadata = Column(JSON, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    audio_features = Column(JSONType, nullable=True)
+    track_metadata = Column(JSONType, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 
 class UserPreferences(Base):
     __tablename__ = "user_preferences"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False, index=True)
-    preference_vector = Column(JSON, nullable=True)  # List of floats
-    feature_weights = Column(JSON, nullable=True)  # Dict of feature weights
-    preferred_genres = Column(JSON, nullable=True)  # List of preferred genres
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)  # UNIQUE already implies an index
+    preference_vector = Column(PackedFloatList, nullable=True)  # List of floats (packed binary)
+    feature_weights = Column(JSONType, nullable=True)  # Dict of feature weights
+    preferred_genres = Column(JSONType, nullable=True)  # List of preferred genres
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
@@ -60,6 +136,9 @@ def init_db():
     """Initialize database - create all tables"""
     try:
         Base.metadata.create_all(bind=engine)
+        # create_all skips tables that already exist, so add any indexes introduced since
+        for index in SwipeHistory.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
@@ -75,3 +154,12 @@ def get_db():
         db.close()
 
 
+def bulk_insert_swipes(db: Session, rows: List[Dict]):
+    """
+    Insert many swipes with a single executemany INSERT and one commit
+    Each row is a dict keyed by SwipeHistory column names
+    """
+    if not rows:
+        return
+    db.execute(SwipeHistory.__table__.insert(), rows)
+    db.commit()
@@ -3,9 +3,10 @@ Deezer API Client - Alternative to Spotify for audio features
 Deezer provides BPM and some audio data without strict restrictions
 """
 
-import requests
 from typing import Optional, Dict, List
 import logging
+from http_session import create_session, loads_json, CircuitBreaker
+from lookup_cache import TTLCache, normalize_key, MISSING
 
 logger = logging.getLogger(__name__)
 
@@ -14,16 +15,26 @@ class DeezerClient:
     
     BASE_URL = "https://api.deezer.com"
     
+    def __init__(self):
+        self.session = create_session()
+        self.breaker = CircuitBreaker('Deezer')
+        # Preview URLs are signed and expire after a few hours, so keep them for 1 hour
+        self._preview_cache = TTLCache(maxsize=4096, ttl=3600)
+    
     def search_track(self, query: str) -> Optional[Dict]:
         """Search for a track on Deezer"""
+        if not self.breaker.allow():
+            return None
+        
         try:
-            response = requests.get(
+            response = self.breaker.get(
+                self.session,
                 f"{self.BASE_URL}/search",
                 params={"q": query, "limit": 1}
             )
             
             if response.status_code == 200:
-                data = response.json()
+                data = loads_json(response)
                 if data.get('data'):
                     return data['data'][0]
             return None
@@ -33,11 +44,14 @@ class DeezerClient:
     
     def get_track_info(self, track_id: int) -> Optional[Dict]:
         """Get track information including BPM and preview URL"""
+        if not self.breaker.allow():
+            return None
+        
         try:
-            response = requests.get(f"{self.BASE_URL}/track/{track_id}")
+            response = self.breaker.get(self.session, f"{self.BASE_URL}/track/{track_id}")
             
             if response.status_code == 200:
-                return response.json()
+                return loads_json(response)
             return None
         except Exception as e:
             logger.error(f"Deezer track info error: {e}")
@@ -48,14 +62,24 @@ class DeezerClient:
         Get Deezer preview URL for a track
         Deezer provides 30-second previews for free!
         """
+        cache_key = normalize_key(artist_name, track_name)
+        cached = self._preview_cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
+        
         try:
             query = f"{artist_name} {track_name}"
             track = self.search_track(query)
             
+            preview_url = None
             if track and track.get('preview'):
-                return track['preview']  # Deezer provides direct MP3 preview URLs!
+                preview_url = track['preview']  # Deezer provides direct MP3 preview URLs!
             
-            return None
+            # Misses are cached too, but for less time in case the search just failed
+            # (and not at all while Deezer is being skipped by the circuit breaker)
+            if preview_url or self.breaker.allow():
+                self._preview_cache.set(cache_key, preview_url, ttl=None if preview_url else 600)
+            return preview_url
         except Exception as e:
             logger.debug(f"Deezer preview error for {artist_name} - {track_name}: {e}")
             return None
@@ -72,8 +96,12 @@ class DeezerClient:
         if not track:
             return None
         
-        # Get detailed info
-        track_info = self.get_track_info(track['id'])
+        # Search hits sometimes already carry BPM + duration - only fetch the full
+        # track when they don't (Deezer reports bpm=0 when unknown)
+        if track.get('bpm') and track.get('duration'):
+            track_info = track
+        else:
+            track_info = self.get_track_info(track['id'])
         
         if not track_info:
             return None
@@ -3,16 +3,85 @@ Feature Fusion System
 Combines audio features from multiple sources for maximum accuracy
 """
 
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import re
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor, wait
 import requests
+from http_session import create_session, loads_json, CircuitBreaker, REQUEST_TIMEOUT
+from config import settings
+from lookup_cache import TTLCache, PersistentTTLCache, memoize, normalize_key, MISSING
 
 logger = logging.getLogger(__name__)
 
+# Shared worker pool for the per-track source fan-out (no per-call thread spin-up/teardown)
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='feature-fusion')
+
+# Keep-alive connections to Deezer/MusicBrainz/AcousticBrainz, sized for the pool above
+# (MusicBrainz rejects requests without a descriptive User-Agent)
+_session = create_session(
+    headers={'User-Agent': 'MusicSwipeApp/1.0'},
+    pool_connections=8,
+    pool_maxsize=32
+)
+
+# The same tracks get re-scored constantly - remember lookups for a day, misses for an hour
+_LOOKUP_TTL = 86400
+_MISS_TTL = 3600
+_MUSICBRAINZ_TTL = 7 * 86400  # Recording IDs are stable - keep matches for a week
+
+
+def _lookup_cache(namespace: str, ttl: float = _LOOKUP_TTL):
+    """
+    Per-source lookup cache, persisted to settings.feature_cache_path when configured
+    (the persistent cache also serves expired entries while a source is down)
+    """
+    if settings.feature_cache_path:
+        return PersistentTTLCache(settings.feature_cache_path, namespace, maxsize=10000, ttl=ttl)
+    return TTLCache(maxsize=10000, ttl=ttl)
+
+
+# One breaker per upstream: after 3 straight failures that source is skipped for 30s.
+# Open breakers raise CircuitOpenError (caught by the fan-out) so the skip isn't cached as a miss -
+# the fetchers let request errors and 5xx responses raise for the same reason
+_breakers = {
+    source: CircuitBreaker(source, fail_max=3, reset_timeout=30)
+    for source in ('deezer', 'musicbrainz', 'acousticbrainz')
+}
+
+def _found(response: requests.Response) -> bool:
+    """
+    True for a 200, False for a genuine not-found (404 and other client errors)
+    Server errors and rate limiting raise instead: the memoized lookups then serve a stale
+    entry (or nothing) rather than caching an outage as a miss for _MISS_TTL
+    """
+    if response.status_code >= 500 or response.status_code == 429:
+        raise requests.HTTPError(f"{response.status_code} from {response.url}", response=response)
+    return response.status_code == 200
+
+
+# Neutral features used when no source has a value - read-only, copy before mutating
+_DEFAULT_FEATURES = MappingProxyType({
+    'acousticness': 0.5,
+    'danceability': 0.5,
+    'energy': 0.5,
+    'instrumentalness': 0.5,
+    'liveness': 0.1,
+    'loudness': -10.0,
+    'speechiness': 0.1,
+    'tempo': 120.0,
+    'valence': 0.5,
+    'duration_ms': 200000,
+    'key': 0
+})
+
+# AcousticBrainz entries are shared by the single and batch lookups
+_acousticbrainz_cache = _lookup_cache('acousticbrainz')
+
 
 class FeatureFusion:
-    """Combines features from multiple sources with weighted averaging"""
+    """Combines features from multiple sources, weighted by source reliability"""
     
     # Reliability weights for each source (higher = more trustworthy)
     SOURCE_WEIGHTS = {
@@ -22,92 +91,179 @@ class FeatureFusion:
         'deezer': 0.6,         # Has BPM, limited other features
         'essentia': 0.85,      # Good analysis library
     }
+    DEFAULT_SOURCE_WEIGHT = 0.5  # Unknown sources
+    
+    # Features every combined result carries
+    FEATURE_NAMES = (
+        'acousticness', 'danceability', 'energy', 'instrumentalness',
+        'liveness', 'loudness', 'speechiness', 'tempo', 'valence',
+        'duration_ms', 'key'
+    )
+    
+    MUSICBRAINZ_URL = "https://musicbrainz.org/ws/2/recording"
+    # Inside a quoted Lucene phrase only `"` and `\` are special
+    _PHRASE_SPECIAL = re.compile(r'(["\\])')
+    
+    ACOUSTICBRAINZ_URL = "https://acousticbrainz.org/api/v1"
+    ACOUSTICBRAINZ_BATCH_SIZE = 25  # Max recording_ids per bulk low-level request
+    
+    @staticmethod
+    def _parse_acousticbrainz(data: Dict) -> Dict:
+        """Extract features from an AcousticBrainz low-level document"""
+        return {
+            'tempo': data.get('rhythm', {}).get('bpm', 120),
+            'key': data.get('tonal', {}).get('key_key', 0),
+            'loudness': data.get('lowlevel', {}).get('average_loudness', -10),
+            'energy': min(1.0, data.get('rhythm', {}).get('beats_loudness', {}).get('mean', 0.5)),
+            # AcousticBrainz has these but in different format
+            'source': 'acousticbrainz'
+        }
     
     @staticmethod
+    @memoize(_acousticbrainz_cache, miss_ttl=_MISS_TTL)
     def fetch_acousticbrainz_features(musicbrainz_id: str) -> Optional[Dict]:
-        """Fetch features from AcousticBrainz database"""
-        try:
-            url = f"https://acousticbrainz.org/api/v1/{musicbrainz_id}/low-level"
-            response = requests.get(url, timeout=5)
+        """
+        Fetch features from AcousticBrainz database
+        None only when the recording has no data (cached as a miss); an open breaker,
+        request errors and 5xx raise like the other fetchers, so callers must catch
+        """
+        breaker = _breakers['acousticbrainz']
+        breaker.check()
+        
+        url = f"{FeatureFusion.ACOUSTICBRAINZ_URL}/{musicbrainz_id}/low-level"
+        response = breaker.get(_session, url, timeout=REQUEST_TIMEOUT)
+        
+        if _found(response):
+            return FeatureFusion._parse_acousticbrainz(loads_json(response))
+        return None
+    
+    @classmethod
+    def fetch_acousticbrainz_batch(cls, musicbrainz_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch features for many recordings using AcousticBrainz's bulk endpoint
+        (up to 25 MBIDs per request instead of one request each)
+        Returns dict of {musicbrainz_id: features} for the recordings that were found
+        """
+        results = {}
+        pending = []
+        
+        for mb_id in dict.fromkeys(musicbrainz_ids):
+            cached = _acousticbrainz_cache.get(normalize_key(mb_id))
+            if cached is MISSING:
+                pending.append(mb_id)
+            elif cached is not None:
+                results[mb_id] = dict(cached)
+        
+        breaker = _breakers['acousticbrainz']
+        for start in range(0, len(pending), cls.ACOUSTICBRAINZ_BATCH_SIZE):
+            if not breaker.allow():
+                break
             
-            if response.status_code == 200:
-                data = response.json()
+            chunk = pending[start:start + cls.ACOUSTICBRAINZ_BATCH_SIZE]
+            try:
+                response = breaker.get(
+                    _session,
+                    f"{cls.ACOUSTICBRAINZ_URL}/low-level",
+                    params={'recording_ids': ';'.join(chunk)},
+                    timeout=REQUEST_TIMEOUT
+                )
+                if not _found(response):
+                    continue
                 
-                # Extract features from AcousticBrainz format
-                return {
-                    'tempo': data.get('rhythm', {}).get('bpm', 120),
-                    'key': data.get('tonal', {}).get('key_key', 0),
-                    'loudness': data.get('lowlevel', {}).get('average_loudness', -10),
-                    'energy': min(1.0, data.get('rhythm', {}).get('beats_loudness', {}).get('mean', 0.5)),
-                    # AcousticBrainz has these but in different format
-                    'source': 'acousticbrainz'
-                }
-        except Exception as e:
-            logger.debug(f"AcousticBrainz fetch failed: {e}")
-        return None
+                # Keyed by MBID, then by submission offset ("0" is the first submission)
+                data = loads_json(response)
+                for mb_id in chunk:
+                    document = (data.get(mb_id) or {}).get('0')
+                    features = cls._parse_acousticbrainz(document) if document else None
+                    _acousticbrainz_cache.set(normalize_key(mb_id), features, ttl=None if features else _MISS_TTL)
+                    if features:
+                        results[mb_id] = dict(features)
+            except Exception as e:
+                # Same stale-if-error fallback memoize gives the single lookup (nothing is cached)
+                logger.debug(f"AcousticBrainz batch fetch failed: {e}")
+                if hasattr(_acousticbrainz_cache, 'get_stale'):
+                    for mb_id in chunk:
+                        stale = _acousticbrainz_cache.get_stale(normalize_key(mb_id))
+                        if stale is not MISSING and stale is not None:
+                            results[mb_id] = dict(stale)
+        
+        return results
     
     @staticmethod
+    @memoize(_lookup_cache('deezer'), miss_ttl=_MISS_TTL)
     def fetch_deezer_features(track_name: str, artist_name: str) -> Optional[Dict]:
-        """Fetch BPM from Deezer"""
-        try:
-            # Search Deezer
-            query = f"{track_name} {artist_name}"
-            response = requests.get(
-                "https://api.deezer.com/search",
-                params={"q": query, "limit": 1},
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('data'):
-                    track = data['data'][0]
-                    track_id = track['id']
-                    
-                    # Get track details
-                    track_response = requests.get(
-                        f"https://api.deezer.com/track/{track_id}",
-                        timeout=5
-                    )
+        """
+        Fetch BPM from Deezer
+        None only when Deezer has no match (cached as a miss); transport errors, 5xx
+        and malformed bodies raise so an outage isn't cached
+        """
+        breaker = _breakers['deezer']
+        breaker.check()
+        
+        # Search Deezer
+        query = f"{track_name} {artist_name}"
+        response = breaker.get(
+            _session,
+            "https://api.deezer.com/search",
+            params={"q": query, "limit": 1},
+            timeout=REQUEST_TIMEOUT
+        )
+        
+        if _found(response):
+            data = loads_json(response)
+            if data.get('data'):
+                track = data['data'][0]
+                track_id = track['id']
+                
+                # Get track details
+                track_response = breaker.get(
+                    _session,
+                    f"https://api.deezer.com/track/{track_id}",
+                    timeout=REQUEST_TIMEOUT
+                )
+                
+                if _found(track_response):
+                    track_data = loads_json(track_response)
+                    bpm = track_data.get('bpm')
                     
-                    if track_response.status_code == 200:
-                        track_data = track_response.json()
-                        bpm = track_data.get('bpm')
+                    if bpm:
+                        # Estimate energy from BPM
+                        energy = min(1.0, max(0.0, (bpm - 60) / 140))
                         
-                        if bpm:
-                            # Estimate energy from BPM
-                            energy = min(1.0, max(0.0, (bpm - 60) / 140))
-                            
-                            return {
-                                'tempo': float(bpm),
-                                'energy': energy,
-                                'danceability': min(1.0, energy * 1.2),
-                                'source': 'deezer'
-                            }
-        except Exception as e:
-            logger.debug(f"Deezer fetch failed: {e}")
+                        return {
+                            'tempo': float(bpm),
+                            'energy': energy,
+                            'danceability': min(1.0, energy * 1.2),
+                            'source': 'deezer'
+                        }
         return None
     
     @staticmethod
+    @memoize(_lookup_cache('musicbrainz', ttl=_MUSICBRAINZ_TTL), miss_ttl=_MISS_TTL)
     def search_musicbrainz_id(track_name: str, artist_name: str) -> Optional[str]:
-        """Search for MusicBrainz recording ID"""
-        try:
-            url = "https://musicbrainz.org/ws/2/recording"
-            params = {
-                'query': f'recording:"{track_name}" AND artist:"{artist_name}"',
-                'fmt': 'json',
-                'limit': 1
-            }
-            headers = {'User-Agent': 'MusicSwipeApp/1.0'}
-            
-            response = requests.get(url, params=params, headers=headers, timeout=5)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('recordings'):
-                    return data['recordings'][0]['id']
-        except Exception as e:
-            logger.debug(f"MusicBrainz search failed: {e}")
+        """
+        Search for MusicBrainz recording ID
+        None only when nothing matches (cached as a miss); outages raise, as in fetch_deezer_features
+        """
+        breaker = _breakers['musicbrainz']
+        breaker.check()
+        
+        # Escape the phrases - a quote in a title would otherwise end the phrase early
+        # and turn the rest of the title into (invalid or wrong) query syntax
+        track_phrase = FeatureFusion._PHRASE_SPECIAL.sub(r'\\\1', track_name)
+        artist_phrase = FeatureFusion._PHRASE_SPECIAL.sub(r'\\\1', artist_name)
+        params = {
+            'query': f'recording:"{track_phrase}" AND artist:"{artist_phrase}"',
+            'fmt': 'json',
+            'limit': 1
+        }
+        
+        response = breaker.get(_session, FeatureFusion.MUSICBRAINZ_URL, params=params, timeout=REQUEST_TIMEOUT)
+        
+        if _found(response):
+            data = loads_json(response)
+            if data.get('recordings'):
+                return data['recordings'][0]['id']
         return None
     
     @classmethod
@@ -123,59 +279,81 @@ class FeatureFusion:
         Returns dict of {source_name: features}
         """
         results = {}
+        outcomes = {}  # source -> features (or None), in the order sources are listed below
+        futures = {}
         
-        # Use ThreadPoolExecutor to fetch from multiple sources simultaneously
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            futures = {}
-            
-            # Librosa analysis (if preview URL available)
-            # Disabled - crashes on some systems
-            # if preview_url:
-            #     try:
-            #         from audio_analyzer import audio_analyzer
-            #         futures['librosa'] = executor.submit(
-            #             audio_analyzer.analyze_preview_url,
-            #             preview_url
-            #         )
-            #     except Exception as e:
-            #         logger.debug(f"Librosa not available: {e}")
-            
-            # Deezer
-            futures['deezer'] = executor.submit(
+        # Librosa analysis (if preview URL available)
+        # Disabled - crashes on some systems
+        # if preview_url:
+        #     try:
+        #         from audio_analyzer import audio_analyzer
+        #         futures['librosa'] = _executor.submit(
+        #             audio_analyzer.analyze_preview_url,
+        #             preview_url
+        #         )
+        #     except Exception as e:
+        #         logger.debug(f"Librosa not available: {e}")
+        
+        # Lookups already in the cache are answered right here - only sources that actually
+        # need the network are handed to the pool (no thread hop or wait for cache hits)
+        
+        # Deezer
+        deezer_features = cls.fetch_deezer_features.peek(track_name, artist_name)
+        if deezer_features is MISSING:
+            futures['deezer'] = _executor.submit(
                 cls.fetch_deezer_features,
                 track_name,
                 artist_name
             )
+        outcomes['deezer'] = deezer_features
+        
+        # AcousticBrainz (need MusicBrainz ID first - both requests chained on one worker)
+        def fetch_acousticbrainz_with_search():
+            mb_id = cls.search_musicbrainz_id(track_name, artist_name)
+            if mb_id:
+                return cls.fetch_acousticbrainz_features(mb_id)
+            return None
+        
+        mb_id = cls.search_musicbrainz_id.peek(track_name, artist_name)
+        if mb_id is MISSING:
+            acousticbrainz_features = MISSING
+        else:
+            acousticbrainz_features = cls.fetch_acousticbrainz_features.peek(mb_id) if mb_id else None
+        if acousticbrainz_features is MISSING:
+            futures['acousticbrainz'] = _executor.submit(fetch_acousticbrainz_with_search)
+        outcomes['acousticbrainz'] = acousticbrainz_features
+        
+        # Spotify audio_features - REMOVED by Spotify in 2024/2025
+        # No longer available, so we don't try it
+        
+        # One shared deadline for all sources rather than 10s per future; stragglers are
+        # abandoned (not a `with` block, so we don't wait for them on the way out)
+        if futures:
+            done, _ = wait(futures.values(), timeout=10)
             
-            # AcousticBrainz (need MusicBrainz ID first)
-            def fetch_acousticbrainz_with_search():
-                mb_id = cls.search_musicbrainz_id(track_name, artist_name)
-                if mb_id:
-                    return cls.fetch_acousticbrainz_features(mb_id)
-                return None
-            
-            futures['acousticbrainz'] = executor.submit(fetch_acousticbrainz_with_search)
-            
-            # Spotify audio_features - REMOVED by Spotify in 2024/2025
-            # No longer available, so we don't try it
-            
-            # Collect results as they complete
             for source, future in futures.items():
+                outcomes[source] = None
+                if future not in done:
+                    future.cancel()
+                    logger.debug(f"Timed out getting features from {source}")
+                    continue
                 try:
-                    result = future.result(timeout=10)
-                    if result:
-                        result['source'] = source
-                        results[source] = result
-                        logger.info(f"✅ Got features from {source}")
+                    outcomes[source] = future.result()
                 except Exception as e:
                     logger.debug(f"Failed to get features from {source}: {e}")
         
+        for source, result in outcomes.items():
+            if result:
+                result['source'] = source
+                results[source] = result
+                logger.info(f"✅ Got features from {source}")
+        
         return results
     
     @classmethod
     def combine_features(cls, source_features: Dict[str, Dict]) -> Dict:
         """
-        Combine features from multiple sources using weighted averaging
+        Combine features from multiple sources using a weighted median
         
         Args:
             source_features: Dict of {source_name: features_dict}
@@ -186,79 +364,71 @@ class FeatureFusion:
         if not source_features:
             return cls._default_features()
         
-        # If we only have one source, use it directly
+        # If we only have one source, use it directly (no weighting needed)
         if len(source_features) == 1:
-            source, features = list(source_features.items())[0]
+            (source, features), = source_features.items()
             logger.info(f"Using single source: {source}")
             return cls._normalize_features(features)
         
         logger.info(f"Combining features from {len(source_features)} sources: {list(source_features.keys())}")
         
-        # Initialize combined features
-        combined = {}
+        # Single pass over sources collecting each feature's (value, weight) readings
+        names = cls.FEATURE_NAMES
+        readings = [[] for _ in names]
         
-        # List of features to combine
-        feature_names = [
-            'acousticness', 'danceability', 'energy', 'instrumentalness',
-            'liveness', 'loudness', 'speechiness', 'tempo', 'valence',
-            'duration_ms', 'key'
-        ]
-        
-        for feature in feature_names:
-            weighted_values = []
-            total_weight = 0
-            
-            for source, features in source_features.items():
-                if feature in features and features[feature] is not None:
-                    try:
-                        # Convert to float (handles strings, ints, floats)
-                        value = float(features[feature])
-                        weight = cls.SOURCE_WEIGHTS.get(source, 0.5)
-                        
-                        weighted_values.append(value * weight)
-                        total_weight += weight
-                    except (ValueError, TypeError):
-                        # Skip values that can't be converted to float
-                        logger.debug(f"Skipping non-numeric value for {feature} from {source}: {features[feature]}")
-                        continue
+        for source, features in source_features.items():
+            weight = cls.SOURCE_WEIGHTS.get(source, cls.DEFAULT_SOURCE_WEIGHT)
             
-            if weighted_values and total_weight > 0:
-                # Weighted average
-                combined[feature] = sum(weighted_values) / total_weight
-            else:
-                # Use default
-                combined[feature] = cls._default_features()[feature]
+            for feature, feature_readings in zip(names, readings):
+                value = features.get(feature)
+                if value is None:
+                    continue
+                try:
+                    # Convert to float (handles strings, ints, floats)
+                    feature_readings.append((float(value), weight))
+                except (ValueError, TypeError):
+                    # Skip values that can't be converted to float
+                    logger.debug(f"Skipping non-numeric value for {feature} from {source}: {value}")
+        
+        # Weighted median, or the neutral default when no source had the feature. Unlike a
+        # mean, one far-off source (a doubled Deezer BPM) can't drag the result, and a source
+        # reporting 0 only counts as one reading rather than collapsing it
+        combined = {
+            feature: cls._weighted_median(feature_readings) if feature_readings else _DEFAULT_FEATURES[feature]
+            for feature, feature_readings in zip(names, readings)
+        }
         
         logger.info(f"✅ Combined features from multiple sources successfully")
         return combined
     
+    @staticmethod
+    def _weighted_median(readings: List[Tuple[float, float]]) -> float:
+        """
+        Value at half the total weight of (value, weight) readings. When a reading ends
+        exactly at the halfway point (e.g. two equally weighted sources) it is averaged
+        with the next one
+        """
+        readings = sorted(readings)
+        half = sum(weight for _, weight in readings) / 2
+        cumulative = 0.0
+        for i, (value, weight) in enumerate(readings):
+            cumulative += weight
+            if cumulative >= half:
+                if abs(cumulative - half) < 1e-9 and i + 1 < len(readings):
+                    return (value + readings[i + 1][0]) / 2
+                return value
+        return readings[-1][0]
+    
     @staticmethod
     def _normalize_features(features: Dict) -> Dict:
-        """Ensure all required features exist with sensible defaults"""
-        defaults = FeatureFusion._default_features()
-        
-        for key in defaults:
-            if key not in features or features[key] is None:
-                features[key] = defaults[key]
-        
-        return features
+        """Ensure all required features exist with sensible defaults (returns a new dict)"""
+        # C-level dict merge instead of a per-key check; None values fall back to the default
+        return {**_DEFAULT_FEATURES, **{key: value for key, value in features.items() if value is not None}}
     
     @staticmethod
     def _default_features() -> Dict:
-        """Return default neutral features"""
-        return {
-            'acousticness': 0.5,
-            'danceability': 0.5,
-            'energy': 0.5,
-            'instrumentalness': 0.5,
-            'liveness': 0.1,
-            'loudness': -10.0,
-            'speechiness': 0.1,
-            'tempo': 120.0,
-            'valence': 0.5,
-            'duration_ms': 200000,
-            'key': 0
-        }
+        """Return default neutral features (a fresh, mutable copy)"""
+        return dict(_DEFAULT_FEATURES)
     
     @classmethod
     def get_fused_features(
@@ -283,7 +453,7 @@ class FeatureFusion:
             track_id
         )
         
-        # Combine with weighted averaging
+        # Combine with a reliability-weighted median
         combined = cls.combine_features(source_features)
         
         # Add metadata about sources used
@@ -293,6 +463,54 @@ class FeatureFusion:
         logger.info(f"✅ Final features using {len(source_features)} sources: {', '.join(source_features.keys())}")
         
         return combined
+    
+    @classmethod
+    def get_fused_features_batch(cls, tracks: List[Dict]) -> List[Dict]:
+        """
+        Batched get_fused_features for many tracks (dicts with 'name' and 'artist')
+        Deezer and MusicBrainz lookups run in parallel, then AcousticBrainz is queried
+        in bulk - N/25 requests instead of N. Results are in the same order as `tracks`
+        """
+        deezer_futures = [
+            _executor.submit(cls.fetch_deezer_features, track['name'], track['artist'])
+            for track in tracks
+        ]
+        musicbrainz_futures = [
+            _executor.submit(cls.search_musicbrainz_id, track['name'], track['artist'])
+            for track in tracks
+        ]
+        done, _ = wait(deezer_futures + musicbrainz_futures, timeout=10)
+        
+        def result_of(future):
+            if future not in done:
+                future.cancel()
+                return None
+            try:
+                return future.result()
+            except Exception as e:
+                logger.debug(f"Feature lookup failed: {e}")
+                return None
+        
+        deezer_results = [result_of(future) for future in deezer_futures]
+        mb_ids = [result_of(future) for future in musicbrainz_futures]
+        acousticbrainz_results = cls.fetch_acousticbrainz_batch([mb_id for mb_id in mb_ids if mb_id])
+        
+        fused = []
+        for deezer_features, mb_id in zip(deezer_results, mb_ids):
+            source_features = {}
+            if deezer_features:
+                source_features['deezer'] = deezer_features
+            if mb_id in acousticbrainz_results:
+                source_features['acousticbrainz'] = acousticbrainz_results[mb_id]
+            
+            combined = cls.combine_features(source_features)
+            combined['_sources_used'] = list(source_features.keys())
+            combined['_num_sources'] = len(source_features)
+            fused.append(combined)
+        
+        logger.info(f"✅ Fused features for {len(tracks)} tracks ({len(acousticbrainz_results)} from AcousticBrainz)")
+        
+        return fused
 
 
 # Global instance
@@ -0,0 +1,126 @@
+"""
+Shared HTTP session helpers
+Pooled, keep-alive requests sessions for the external API clients
+"""
+
+import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Optional, Dict, Any, Sequence
+
+logger = logging.getLogger(__name__)
+
+# orjson parses straight from bytes and is several times faster than stdlib json
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+# Retry transient upstream failures (rate limits, gateway errors) with a short backoff
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+# (connect, read) timeouts: a host that can't even accept a connection fails fast,
+# while a slow-but-alive response still gets time to arrive
+REQUEST_TIMEOUT = (1.5, 4.0)
+
+
+def create_session(
+    headers: Optional[Dict[str, str]] = None,
+    pool_connections: int = 4,
+    pool_maxsize: int = 16,
+    retry_status_codes: Sequence[int] = RETRY_STATUS_CODES
+) -> requests.Session:
+    """
+    Create a requests.Session with a pooled HTTPAdapter
+    Reuses TCP+TLS connections across calls instead of reconnecting every request
+    Leave 429 out of retry_status_codes to handle rate limits yourself - the response
+    then comes straight back instead of the adapter sleeping out Retry-After
+    """
+    session = requests.Session()
+
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,  # Well above our thread pool sizes to avoid connection thrash
+        max_retries=Retry(
+            total=2,
+            backoff_factor=0.2,
+            status_forcelist=retry_status_codes,
+            respect_retry_after_header=429 in retry_status_codes,
+            allowed_methods=['GET'],
+            raise_on_status=False  # Hand the last response back so callers can check status_code
+        )
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    if headers:
+        session.headers.update(headers)
+
+    return session
+
+
+def loads_json(response: requests.Response) -> Any:
+    """Decode a JSON response body (orjson when installed, stdlib json otherwise)"""
+    return _json.loads(response.content)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of making a request while a circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker: after `fail_max` consecutive failures, calls are refused
+    for `reset_timeout` seconds instead of each one waiting out the full request timeout.
+    Once the timeout passes a trial call is let through - success closes the breaker,
+    another failure opens it again
+    """
+
+    def __init__(self, name: str, fail_max: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """False while the breaker is open (upstream considered down)"""
+        return time.monotonic() >= self._open_until
+
+    def check(self):
+        """Raise CircuitOpenError while the breaker is open"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit open")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._open_until = 0.0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.fail_max:
+                self._open_until = time.monotonic() + self.reset_timeout
+                logger.warning(f"⚡ {self.name} circuit open for {self.reset_timeout}s after {self._failures} failures")
+
+    def record_response(self, response: requests.Response):
+        """Count server errors / rate limiting as failures, anything else as success"""
+        if response.status_code in RETRY_STATUS_CODES:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def get(self, session: requests.Session, url: str, **kwargs) -> requests.Response:
+        """session.get() with the outcome recorded - check allow() before calling"""
+        try:
+            response = session.get(url, **kwargs)
+        except requests.RequestException:
+            self.record_failure()
+            raise
+        self.record_response(response)
+        return response
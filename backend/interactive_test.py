@@ -191,10 +191,9 @@ def show_detailed_breakdown(seed_track, seed_features, top_rec):
     from recommendation_engine import (
         normalize_audio_features,
         apply_feature_weights,
-        cosine_similarity,
-        euclidean_similarity,
-        manhattan_similarity,
+        feature_similarities,
         jaccard_similarity,
+        tag_set,
         calculate_temporal_similarity,
         calculate_popularity_adjustment
     )
@@ -202,14 +201,12 @@ def show_detailed_breakdown(seed_track, seed_features, top_rec):
     seed_vec = apply_feature_weights(normalize_audio_features(seed_features))
     rec_vec = apply_feature_weights(normalize_audio_features(top_rec['audio_features']))
     
-    cos_sim = cosine_similarity(seed_vec, rec_vec)
-    euc_sim = euclidean_similarity(seed_vec, rec_vec)
-    man_sim = manhattan_similarity(seed_vec, rec_vec)
+    cos_sim, euc_sim, man_sim = feature_similarities(seed_vec, rec_vec)
     
     feature_score = 0.35 * cos_sim + 0.15 * euc_sim + 0.10 * man_sim
     
-    seed_tags = seed_metadata['genres'] + seed_metadata.get('lastfm_tags', [])
-    rec_tags = top_rec['metadata']['genres'] + top_rec['metadata']['lastfm_tags']
+    seed_tags = tag_set(seed_metadata['genres'] + seed_metadata.get('lastfm_tags', []))
+    rec_tags = tag_set(top_rec['metadata']['genres'] + top_rec['metadata']['lastfm_tags'])
     jaccard_sim = jaccard_similarity(seed_tags, rec_tags)
     
     temporal = calculate_temporal_similarity(
@@ -225,7 +222,7 @@ def show_detailed_breakdown(seed_track, seed_features, top_rec):
     print(f"     - Euclidean distance:   {euc_sim:.4f}")
     print(f"     - Manhattan distance:   {man_sim:.4f}")
     print(f"\n  🏷️  Genre/Tags (20%):     {jaccard_sim:.4f}")
-    print(f"     - Common tags: {list(set(seed_tags) & set(rec_tags))[:5]}")
+    print(f"     - Common tags: {list(seed_tags & rec_tags)[:5]}")
     print(f"\n  👥 Last.fm Score (15%):   {top_rec['metadata'].get('lastfm_similarity', 0):.4f}")
     print(f"\n  📅 Era Match (2.5%):      {temporal:.4f}")
     print(f"     - Seed: {seed_metadata['release_year']}, This: {top_rec['metadata']['release_year']}")
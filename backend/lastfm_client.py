@@ -1,49 +1,75 @@
-import pylast
 from config import settings
-from typing import List, Dict, Optional
+from http_session import create_session, loads_json
+from typing import List, Dict, Optional, Any
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class LastFmError(Exception):
+    """Error returned by the Last.fm API ({"error": code, "message": ...})"""
+
+
 class LastFmClient:
+    """
+    Last.fm client calling the JSON web API directly
+    (read-only methods only need the API key - no XML parsing, pooled keep-alive connections)
+    """
+    
+    API_URL = "https://ws.audioscrobbler.com/2.0/"
+    
     def __init__(self):
         if not settings.lastfm_api_key:
             logger.warning("Last.fm API key not set. Please configure LASTFM_API_KEY in .env")
-            self.network = None
+            self.api_key = None
         else:
-            try:
-                self.network = pylast.LastFMNetwork(
-                    api_key=settings.lastfm_api_key,
-                    api_secret=settings.lastfm_api_secret if settings.lastfm_api_secret else ""
-                )
-            except Exception as e:
-                logger.error(f"Failed to initialize Last.fm client: {e}")
-                self.network = None
+            self.api_key = settings.lastfm_api_key
+        self.session = create_session(headers={'User-Agent': 'MusicSwipeApp/1.0'})
+    
+    def _get(self, method: str, **params) -> Dict[str, Any]:
+        """Call a Last.fm API method and return the decoded JSON body"""
+        response = self.session.get(
+            self.API_URL,
+            params={'method': method, 'api_key': self.api_key, 'format': 'json', **params},
+            timeout=5
+        )
+        data = loads_json(response)
+        
+        # Errors come back as {"error": <code>, "message": ...}, sometimes with a 200 status
+        if 'error' in data:
+            raise LastFmError(f"{data.get('error')}: {data.get('message')}")
+        response.raise_for_status()
+        return data
+    
+    @staticmethod
+    def _as_list(items) -> List[Dict]:
+        """Last.fm JSON collapses single-item lists into a bare object"""
+        if not items:
+            return []
+        return items if isinstance(items, list) else [items]
     
     def get_similar_tracks(self, artist: str, track: str, limit: int = 50) -> List[Dict]:
         """Get similar tracks from Last.fm"""
-        if not self.network:
+        if not self.api_key:
             return []
         
         try:
-            track_obj = self.network.get_track(artist, track)
-            similar = track_obj.get_similar(limit=limit)
+            data = self._get('track.getSimilar', artist=artist, track=track, limit=limit)
             
             results = []
-            for sim_track, score in similar:
+            for sim_track in self._as_list(data.get('similartracks', {}).get('track')):
                 try:
                     results.append({
-                        'artist': sim_track.artist.name,
-                        'track': sim_track.title,
-                        'similarity_score': float(score)
+                        'artist': sim_track['artist']['name'],
+                        'track': sim_track['name'],
+                        'similarity_score': float(sim_track['match'])
                     })
                 except Exception as e:
                     logger.debug(f"Error processing similar track: {e}")
                     continue
             
             return results
-        except pylast.WSError as e:
+        except LastFmError as e:
             logger.error(f"Last.fm API error for {artist} - {track}: {e}")
             return []
         except Exception as e:
@@ -52,15 +78,15 @@ class LastFmClient:
     
     def get_track_tags(self, artist: str, track: str, limit: int = 10) -> List[str]:
         """Get tags/genres for a track"""
-        if not self.network:
+        if not self.api_key:
             return []
         
         try:
-            track_obj = self.network.get_track(artist, track)
-            tags = track_obj.get_top_tags(limit=limit)
+            data = self._get('track.getTopTags', artist=artist, track=track)
+            tags = self._as_list(data.get('toptags', {}).get('tag'))
             
-            return [tag.item.name.lower() for tag in tags]
-        except pylast.WSError as e:
+            return [tag['name'].lower() for tag in tags[:limit]]
+        except LastFmError as e:
             logger.debug(f"Last.fm API error getting tags for {artist} - {track}: {e}")
             return []
         except Exception as e:
@@ -69,15 +95,15 @@ class LastFmClient:
     
     def get_similar_artists(self, artist: str, limit: int = 20) -> List[str]:
         """Get similar artists"""
-        if not self.network:
+        if not self.api_key:
             return []
         
         try:
-            artist_obj = self.network.get_artist(artist)
-            similar = artist_obj.get_similar(limit=limit)
+            data = self._get('artist.getSimilar', artist=artist, limit=limit)
+            similar = self._as_list(data.get('similarartists', {}).get('artist'))
             
-            return [sim_artist.item.name for sim_artist in similar]
-        except pylast.WSError as e:
+            return [sim_artist['name'] for sim_artist in similar]
+        except LastFmError as e:
             logger.error(f"Last.fm API error for artist {artist}: {e}")
             return []
         except Exception as e:
@@ -86,13 +112,13 @@ class LastFmClient:
     
     def search_track_on_lastfm(self, artist: str, track: str) -> Optional[Dict]:
         """Search and verify a track exists on Last.fm"""
-        if not self.network:
+        if not self.api_key:
             return None
         
         try:
-            track_obj = self.network.get_track(artist, track)
-            # Try to get playcount to verify track exists
-            playcount = track_obj.get_playcount()
+            # track.getInfo fails for unknown tracks, so a playcount confirms it exists
+            data = self._get('track.getInfo', artist=artist, track=track)
+            playcount = int(data['track'].get('playcount', 0))
             return {
                 'artist': artist,
                 'track': track,
@@ -106,4 +132,3 @@ class LastFmClient:
 # Global instance
 lastfm_client = LastFmClient()
 
-
@@ -4,74 +4,483 @@ Uses local Ollama or free Groq API for semantic understanding
 """
 
 import os
-from typing import List, Dict, Optional
+import threading
+from importlib.util import find_spec
+from functools import lru_cache
+from itertools import islice
+from typing import List, Dict, Optional, Tuple, Pattern
+from concurrent.futures import Future
+from hashlib import blake2b
 import logging
 import json
+import re
+import time
+from config import settings
+from lookup_cache import TTLCache, PersistentTTLCache, MISSING
+from simple_math import dot_product, magnitude
 
 logger = logging.getLogger(__name__)
 
-# Try to import LLM clients
-OLLAMA_AVAILABLE = False
-GROQ_AVAILABLE = False
-
+# google-re2 is optional - when installed, reply parsing runs on its linear-time DFA engine
+RE2_AVAILABLE = False
 try:
-    import ollama
-    OLLAMA_AVAILABLE = True
-    logger.info("✅ Ollama available (local LLM)")
+    import re2
+    RE2_AVAILABLE = True
 except ImportError:
     pass
 
-try:
-    from groq import Groq
-    GROQ_AVAILABLE = True
-    groq_client = Groq(api_key=os.getenv('GROQ_API_KEY')) if os.getenv('GROQ_API_KEY') else None
-    if groq_client:
-        logger.info("✅ Groq available (cloud LLM)")
-except ImportError:
-    pass
+
+def _compile(pattern: str):
+    """Compile with re2 when available, falling back to re for patterns re2 rejects"""
+    if RE2_AVAILABLE:
+        try:
+            return re2.compile(pattern)
+        except re2.error:
+            pass
+    return re.compile(pattern)
+
+
+# Both patterns avoid backreferences/lookaround so they stay re2-compatible
+_SCORE_COMPLETE_RE = _compile(r'[01]\.\d+\D')  # A score the model has finished writing (a non-digit follows)
+_TAG_SPLIT_RE = _compile(r'[,\n;]')  # Tag lists come back comma, semicolon or line separated
+
+# JSON schemas for structured replies - Ollama constrains decoding to them, Groq gets JSON mode
+_SCORE_SCHEMA = {
+    'type': 'object',
+    'properties': {'score': {'type': 'number', 'minimum': 0, 'maximum': 1}},
+    'required': ['score']
+}
+
+
+def _list_schema(field: str, max_items: int) -> Dict:
+    return {
+        'type': 'object',
+        'properties': {field: {'type': 'array', 'items': {'type': 'string'}, 'maxItems': max_items}},
+        'required': [field]
+    }
+
+
+_TAGS_SCHEMA = _list_schema('tags', 10)
+_GENRES_SCHEMA = _list_schema('genres', 8)
+
+# Fixed prompt prefixes - request data always goes after them, so every prompt of a kind
+# starts with the same bytes and the server can reuse the prefix's KV cache instead of
+# re-running prefill on it
+_SIMILARITY_PREFIX = (
+    'Rate how similar these two music tag sets are (genres, moods, eras, styles), 0.0-1.0.\n'
+    'JSON only: {"score": <number>}\n'
+)
+_VIBE_PREFIX = (
+    'List 5-10 music tags (genres, moods, styles, eras) matching the vibe.\n'
+    'JSON only: {"tags": [...]}\n'
+)
+_GENRES_PREFIX = (
+    'Suggest 5-8 related music genres for someone who likes the genres below.\n'
+    'JSON only: {"genres": [...]}\n'
+)
+_EXPLAIN_PREFIX = 'In one sentence, explain why these two songs are similar.\n'
+
+# Check which LLM clients are installed without importing them - the SDKs (and the Groq
+# client's TLS setup) are only loaded by the first request that actually calls an LLM
+OLLAMA_AVAILABLE = find_spec('ollama') is not None
+GROQ_AVAILABLE = find_spec('groq') is not None
+
+if OLLAMA_AVAILABLE:
+    logger.info("✅ Ollama available (local LLM)")
+    # Batched calls only run concurrently if the server allows it (OLLAMA_NUM_PARALLEL on the Ollama side)
+    logger.info(f"Ollama parallel requests: OLLAMA_NUM_PARALLEL={os.getenv('OLLAMA_NUM_PARALLEL', 'server default')}")
+if GROQ_AVAILABLE and os.getenv('GROQ_API_KEY'):
+    logger.info("✅ Groq available (cloud LLM)")
+
+# Per-call timeout for LLM requests - a stuck call returns the fallback instead of holding a worker
+LLM_TIMEOUT = 10.0
+
+# Keep-alive pool per client, sized for the batch executor (8 concurrent calls) with headroom
+LLM_MAX_KEEPALIVE = 16
+LLM_MAX_CONNECTIONS = 32
+
+_ollama_client = None
+_groq_client = None
+_client_lock = threading.Lock()
+
+
+def _get_ollama():
+    """Process-wide Ollama client (one keep-alive connection pool), created on first use"""
+    global _ollama_client
+    if _ollama_client is None:
+        with _client_lock:
+            if _ollama_client is None:
+                import httpx
+                import ollama
+                _ollama_client = ollama.Client(
+                    host=os.getenv('OLLAMA_HOST'),
+                    timeout=LLM_TIMEOUT,
+                    limits=httpx.Limits(max_keepalive_connections=LLM_MAX_KEEPALIVE, max_connections=LLM_MAX_CONNECTIONS)
+                )
+    return _ollama_client
+
+
+def _get_groq():
+    """Process-wide Groq client, created on first use (None while GROQ_API_KEY is unset)"""
+    global _groq_client
+    if _groq_client is None:
+        api_key = os.getenv('GROQ_API_KEY')
+        if not api_key:
+            return None
+        with _client_lock:
+            if _groq_client is None:
+                import httpx
+                from groq import Groq
+                _groq_client = Groq(
+                    api_key=api_key,
+                    timeout=LLM_TIMEOUT,
+                    max_retries=1,
+                    http_client=httpx.Client(
+                        timeout=LLM_TIMEOUT,
+                        limits=httpx.Limits(max_keepalive_connections=LLM_MAX_KEEPALIVE, max_connections=LLM_MAX_CONNECTIONS)
+                    )
+                )
+    return _groq_client
+
+
+def close_clients():
+    """Close the LLM clients' connection pools (app shutdown); they are recreated if used again"""
+    global _ollama_client, _groq_client
+    with _client_lock:
+        if _ollama_client is not None:
+            _ollama_client._client.close()
+        if _groq_client is not None:
+            _groq_client.close()
+        _ollama_client = _groq_client = None
+
+
+@lru_cache(maxsize=1)
+def _llm_errors() -> Tuple[type, ...]:
+    """
+    Exceptions a failed LLM call can raise: SDK/API errors, timeouts and connection errors
+    (ollama >= 0.4 raises the builtin ConnectionError when the server is unreachable, hence
+    OSError). Response bodies are validated where they are read, so anything else is a bug
+    and propagates
+    """
+    errors = [OSError]
+    if OLLAMA_AVAILABLE:
+        import httpx
+        from ollama import ResponseError
+        errors += [ResponseError, httpx.HTTPError]
+    if GROQ_AVAILABLE:
+        from groq import GroqError
+        errors.append(GroqError)
+    return tuple(errors)
+
+
+def _reply_text(text) -> Optional[str]:
+    """Stripped completion text, or None (logged) if the response field wasn't a string"""
+    if not isinstance(text, str):
+        logger.warning(f"LLM response had no text: {text!r}")
+        return None
+    return text.strip()
+
+
+def _parse_score(text: str) -> Optional[float]:
+    """First 0.x / 1.x number in an LLM reply, clamped to 0-1 (None if there is none)"""
+    length = len(text)
+    i = text.find('.')
+    while i != -1:
+        # A lone 0 or 1 before the point and at least one digit after it
+        if 1 <= i < length - 1 and text[i - 1] in '01' and text[i + 1].isdigit() \
+                and (i == 1 or not text[i - 2].isdigit()):
+            j = i + 2
+            while j < length and text[j].isdigit():
+                j += 1
+            return min(1.0, float(text[i - 1:j]))
+        i = text.find('.', i + 1)
+    return None
+
+
+def _tag_list(tags: List[str], limit: int) -> str:
+    """Prompt form of a tag list - lowercased, deduplicated and sorted so equal sets give equal prompts"""
+    return _join_tags(tuple(tags[:limit]))
+
+
+@lru_cache(maxsize=4096)
+def _join_tags(tags: Tuple[str, ...]) -> str:
+    # Cached - a seed's tags are formatted again for every candidate it is compared with
+    return ', '.join(sorted({tag.strip().lower() for tag in tags}))
 
 
 class LLMEnhancer:
     """Enhance recommendations using LLM semantic understanding"""
     
+    # Tag similarity is scored by embedding cosine; only scores inside this band are
+    # ambiguous enough to be worth a full LLM completion
+    EMBED_MODEL = 'nomic-embed-text'
+    UNCERTAIN_BAND = (0.35, 0.55)
+    
+    # Ollama: keep the model loaded between requests (the default unloads it after 5 idle
+    # minutes) and use a fixed context so every call shares one loaded model instance
+    OLLAMA_MODEL = 'llama3.2'
+    OLLAMA_KEEP_ALIVE = '30m'
+    OLLAMA_NUM_CTX = 2048
+    
     def __init__(self):
         self.use_ollama = OLLAMA_AVAILABLE
-        self.use_groq = GROQ_AVAILABLE and groq_client
+        self.use_embeddings = OLLAMA_AVAILABLE  # Groq has no embeddings endpoint
+        
+        # Prompts currently being generated, so concurrent identical calls share one request
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
         
         if not self.use_ollama and not self.use_groq:
             logger.warning("No LLM available. Install: ollama or groq")
     
-    def _call_llm(self, prompt: str, max_tokens: int = 100) -> Optional[str]:
-        """Call LLM (tries Ollama first, then Groq)"""
+    @property
+    def use_groq(self) -> bool:
+        # Checked per call so GROQ_API_KEY can be set after import
+        return GROQ_AVAILABLE and bool(os.getenv('GROQ_API_KEY'))
+    
+    def warm_up(self):
+        """
+        Load the Ollama models ahead of the first request (a cold load takes seconds)
+        Uses the same options as real calls so the loaded instance is reused
+        Blocking, up to LLM_TIMEOUT per call - run it off the startup path
+        """
+        if not self.use_ollama:
+            return
+        
+        try:
+            # If the load outlasts LLM_TIMEOUT the server still finishes it in the background
+            _get_ollama().generate(
+                model=self.OLLAMA_MODEL,
+                prompt='ok',
+                keep_alive=self.OLLAMA_KEEP_ALIVE,
+                options={'num_predict': 1, 'num_ctx': self.OLLAMA_NUM_CTX}
+            )
+            if self.use_embeddings:
+                self._embed('ok')
+            logger.info(f"✅ Ollama model {self.OLLAMA_MODEL} loaded")
+        except _llm_errors() as e:
+            logger.warning(f"Ollama warm-up failed: {e}")
+    
+    def _call_llm(
+        self,
+        prompt: str,
+        max_tokens: int = 100,
+        schema: Optional[Dict] = None,
+        stop: Optional[List[str]] = None,
+        stop_at: Optional[Pattern] = None
+    ) -> Optional[str]:
+        """
+        Call LLM (tries Ollama first, then Groq)
+        With a JSON schema the reply is a JSON object (schema-constrained on Ollama);
+        generation ends early at any of the `stop` strings, or - streaming - as soon as
+        the reply so far matches `stop_at`
+        Responses are cached by prompt; failures (None) are not, so they are retried next time
+        Concurrent calls with the same prompt are coalesced: the first one generates and the
+        others wait for its result
+        """
+        cache_key = blake2b(
+            f"{max_tokens}\x1f{json.dumps(schema, sort_keys=True) if schema else ''}\x1f{stop}\x1f{prompt}".encode(),
+            digest_size=16
+        ).hexdigest()
+        cached = _response_cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
+        
+        with self._inflight_lock:
+            future = self._inflight.get(cache_key)
+            leader = future is None
+            if leader:
+                future = self._inflight[cache_key] = Future()
+        
+        if not leader:
+            return future.result()
+        
+        try:
+            response = self._generate(prompt, max_tokens, schema, stop, stop_at)
+            if response is not None:
+                _response_cache.set(cache_key, response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[cache_key]
+    
+    def _generate(
+        self,
+        prompt: str,
+        max_tokens: int,
+        schema: Optional[Dict] = None,
+        stop: Optional[List[str]] = None,
+        stop_at: Optional[Pattern] = None
+    ) -> Optional[str]:
+        """One uncached completion from whichever backend is available"""
+        started = time.perf_counter()
+        stream = stop_at is not None
         try:
             # Try Ollama (local, fast, free!)
             if self.use_ollama:
-                response = ollama.generate(
-                    model='llama3.2',  # Small, fast model
+                response = _get_ollama().generate(
+                    model=self.OLLAMA_MODEL,  # Small, fast model
                     prompt=prompt,
-                    options={'num_predict': max_tokens}
+                    format=schema or '',
+                    keep_alive=self.OLLAMA_KEEP_ALIVE,
+                    options={'num_predict': max_tokens, 'num_ctx': self.OLLAMA_NUM_CTX, **({'stop': stop} if stop else {})},
+                    stream=stream
                 )
-                return response['response'].strip()
+                if stream:
+                    return self._read_stream(response, lambda part: part.get('response'), stop_at)
+                return _reply_text(response.get('response'))
             
             # Fallback to Groq (cloud, fast, free tier)
             elif self.use_groq:
-                response = groq_client.chat.completions.create(
+                # Groq's JSON mode can't be streamed - the prompt still asks for JSON
+                extra = {'response_format': {'type': 'json_object'}} if schema and not stream else {}
+                response = _get_groq().chat.completions.create(
                     model="llama-3.1-8b-instant",  # Fast, free
                     messages=[{"role": "user", "content": prompt}],
                     max_tokens=max_tokens,
-                    temperature=0.3
+                    temperature=0.3,
+                    stop=stop,
+                    stream=stream,
+                    **extra
                 )
-                return response.choices[0].message.content.strip()
+                if stream:
+                    return self._read_stream(
+                        response,
+                        lambda chunk: chunk.choices[0].delta.content if chunk.choices else None,
+                        stop_at
+                    )
+                if not response.choices:
+                    return None
+                return _reply_text(response.choices[0].message.content)
             
-        except Exception as e:
-            logger.error(f"LLM call failed: {e}")
+        except _llm_errors() as e:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            logger.warning(f"LLM call failed after {elapsed_ms:.0f}ms ({type(e).__name__}): {e}")
         
         return None
     
+    @staticmethod
+    def _read_stream(stream, text_of, stop_at: Pattern) -> str:
+        """
+        Accumulate a streamed reply, hanging up as soon as it matches `stop_at` - the model
+        stops generating once the connection closes, so unneeded tokens are never decoded
+        """
+        reply = ''
+        try:
+            for chunk in stream:
+                text = text_of(chunk)
+                if not isinstance(text, str):
+                    continue
+                reply += text
+                if stop_at.search(reply):
+                    break
+        finally:
+            stream.close()
+        return reply.strip()
+    
+    @staticmethod
+    def _similarity_prompt(tags_a: List[str], tags_b: List[str]) -> str:
+        return f"{_SIMILARITY_PREFIX}A: {_tag_list(tags_a, 10)}\nB: {_tag_list(tags_b, 10)}"
+    
+    @staticmethod
+    def _json_field(response: Optional[str], field: str):
+        """`field` of a JSON object reply, or None if the reply isn't one"""
+        try:
+            data = json.loads(response)
+        except (TypeError, ValueError):
+            return None
+        return data.get(field) if isinstance(data, dict) else None
+    
+    @classmethod
+    def _parse_similarity(cls, response: Optional[str], default: float = 0.0) -> float:
+        if not response:
+            return default
+        
+        # Scan for the number directly - covers {"score": 0.8}, a streamed prefix of it,
+        # and replies that ignored the format - without a JSON parse or regex
+        score = _parse_score(response)
+        if score is not None:
+            return score
+        
+        # Integer scores ({"score": 1}) have no decimal point
+        score = cls._json_field(response, 'score')
+        if isinstance(score, (int, float)):
+            return min(1.0, max(0.0, float(score)))
+        return default
+    
+    @classmethod
+    def _parse_tag_list(cls, response: Optional[str], field: str, limit: int, min_length: int = 1) -> List[str]:
+        """
+        Up to `limit` lowercased entries of a JSON list reply (or a comma/line separated one),
+        skipping entries shorter than `min_length` - normalized and filtered in a single pass
+        """
+        if not response:
+            return []
+        
+        items = cls._json_field(response, field)
+        if not isinstance(items, list):
+            items = _TAG_SPLIT_RE.split(response)
+        tags = (item.strip().lower() for item in items if isinstance(item, str))
+        return list(islice((tag for tag in tags if len(tag) >= min_length), limit))
+    
+    def _embed(self, text: str) -> Optional[List[float]]:
+        """Unit-length embedding of a tag list (as built by _tag_list), cached by text"""
+        cached = _embedding_cache.get(text)
+        if cached is not MISSING:
+            return cached
+        if not self.use_embeddings:
+            return None
+        
+        from ollama import ResponseError
+        
+        try:
+            vector = _get_ollama().embeddings(
+                model=self.EMBED_MODEL,
+                prompt=text,
+                keep_alive=self.OLLAMA_KEEP_ALIVE
+            ).get('embedding')
+        except ResponseError as e:
+            # Model not pulled - stop trying and use the LLM. Any other API error (5xx,
+            # overloaded server) only fails this call
+            if e.status_code == 404 or 'not found' in str(e).lower():
+                if self.use_embeddings:
+                    self.use_embeddings = False
+                    logger.warning(f"Ollama embeddings unavailable ({e}), scoring tags with the LLM. Run: ollama pull {self.EMBED_MODEL}")
+            else:
+                logger.debug(f"Embedding failed: {e}")
+            return None
+        except _llm_errors() as e:
+            logger.debug(f"Embedding failed: {e}")
+            return None
+        
+        if not isinstance(vector, list) or not all(isinstance(x, (int, float)) for x in vector):
+            logger.debug(f"Malformed embedding response for {text!r}")
+            return None
+        
+        norm = magnitude(vector)
+        if not norm:
+            return None
+        vector = [x / norm for x in vector]
+        _embedding_cache.set(text, vector)
+        return vector
+    
+    def _embedding_similarity(self, vec_a: Optional[List[float]], vec_b: Optional[List[float]]) -> Optional[float]:
+        """Cosine of two unit embeddings clamped to 0-1, or None if the LLM should decide"""
+        if vec_a is None or vec_b is None:
+            return None
+        score = min(1.0, max(0.0, dot_product(vec_a, vec_b)))
+        low, high = self.UNCERTAIN_BAND
+        return None if low <= score <= high else score
+    
     def semantic_tag_similarity(self, tags_a: List[str], tags_b: List[str]) -> float:
         """
         Calculate semantic similarity between tag sets
         e.g., "synthwave" and "synth-pop" are semantically similar even if not exact match
+        Uses embedding cosine when available, falling back to the LLM for uncertain scores
         """
         if not self.use_ollama and not self.use_groq:
             return 0.0
@@ -79,28 +488,19 @@ class LLMEnhancer:
         if not tags_a or not tags_b:
             return 0.0
         
-        prompt = f"""Compare these music tags semantically. Rate similarity 0.0-1.0.
-
-Tags A: {', '.join(tags_a[:10])}
-Tags B: {', '.join(tags_b[:10])}
-
-Consider: Similar genres, moods, eras, styles.
-Respond with ONLY a number between 0.0 and 1.0.
-
-Similarity score:"""
-        
-        try:
-            response = self._call_llm(prompt, max_tokens=10)
-            if response:
-                # Extract number from response
-                import re
-                match = re.search(r'0\.\d+|1\.0|0\.0', response)
-                if match:
-                    return float(match.group())
-        except:
-            pass
+        if self.use_embeddings:
+            vec_a = self._embed(_tag_list(tags_a, 10))
+            vec_b = self._embed(_tag_list(tags_b, 10))
+            score = self._embedding_similarity(vec_a, vec_b)
+            if score is not None:
+                return score
+            if vec_a is not None and vec_b is not None:
+                # Uncertain band - ask the LLM, keeping the embedding score if that fails
+                response = self._call_llm(self._similarity_prompt(tags_a, tags_b), max_tokens=8, schema=_SCORE_SCHEMA, stop_at=_SCORE_COMPLETE_RE)
+                return self._parse_similarity(response, default=dot_product(vec_a, vec_b))
         
-        return 0.0
+        response = self._call_llm(self._similarity_prompt(tags_a, tags_b), max_tokens=8, schema=_SCORE_SCHEMA, stop_at=_SCORE_COMPLETE_RE)
+        return self._parse_similarity(response)
     
     def analyze_user_vibe(self, vibe_description: str) -> List[str]:
         """
@@ -110,25 +510,10 @@ Similarity score:"""
         if not self.use_ollama and not self.use_groq:
             return []
         
-        prompt = f"""A user wants music for this vibe: "{vibe_description}"
-
-What music tags/genres match this vibe?
-List 5-10 relevant tags (genres, moods, styles, eras).
-
-Respond with ONLY a comma-separated list of tags.
-
-Tags:"""
-        
-        try:
-            response = self._call_llm(prompt, max_tokens=50)
-            if response:
-                # Parse tags
-                tags = [tag.strip().lower() for tag in response.split(',')]
-                return [tag for tag in tags if tag and len(tag) > 2][:10]
-        except:
-            pass
+        prompt = f'{_VIBE_PREFIX}Vibe: "{vibe_description}"'
         
-        return []
+        response = self._call_llm(prompt, max_tokens=40, schema=_TAGS_SCHEMA)
+        return self._parse_tag_list(response, 'tags', limit=10, min_length=3)
     
     def expand_genre_preferences(self, liked_genres: List[str]) -> List[str]:
         """
@@ -141,23 +526,14 @@ Tags:"""
         if not liked_genres:
             return []
         
-        prompt = f"""User likes these music genres: {', '.join(liked_genres[:5])}
-
-Suggest 5-8 similar/related genres they would probably enjoy.
-
-Respond with ONLY a comma-separated list.
-
-Related genres:"""
+        prompt = f"{_GENRES_PREFIX}Genres: {_tag_list(liked_genres, 5)}"
         
-        try:
-            response = self._call_llm(prompt, max_tokens=50)
-            if response:
-                expanded = [g.strip().lower() for g in response.split(',')]
-                # Combine original + expanded
-                all_genres = list(set(liked_genres + expanded))
-                return all_genres[:15]
-        except:
-            pass
+        response = self._call_llm(prompt, max_tokens=32, schema=_GENRES_SCHEMA)
+        expanded = self._parse_tag_list(response, 'genres', limit=8)
+        if expanded:
+            # Combine original + expanded (originals first, so truncation only drops suggestions)
+            all_genres = list(dict.fromkeys(liked_genres + expanded))
+            return all_genres[:15]
         
         return liked_genres
     
@@ -168,28 +544,32 @@ Related genres:"""
         if not self.use_ollama and not self.use_groq:
             return f"Match score: {score*100:.0f}%"
         
-        prompt = f"""Explain why these songs are similar (1 sentence):
-
-Song A: {song_a}
-Tags: {', '.join(tags_a[:5])}
-
-Song B: {song_b}
-Tags: {', '.join(tags_b[:5])}
-
-Match: {score*100:.0f}%
-
-Explanation:"""
+        prompt = (
+            f"{_EXPLAIN_PREFIX}A: {song_a} ({_tag_list(tags_a, 5)})\n"
+            f"B: {song_b} ({_tag_list(tags_b, 5)})\n"
+            f"Match: {score*100:.0f}%\nExplanation:"
+        )
         
-        try:
-            response = self._call_llm(prompt, max_tokens=50)
-            if response:
-                return response
-        except:
-            pass
+        response = self._call_llm(prompt, max_tokens=40, stop=['\n\n'])
+        if response:
+            return response
         
         return f"{score*100:.0f}% match based on genres and community data"
 
 
+# LLM responses keyed on a hash of the prompt - the same tag sets and genre lists come up
+# constantly in a swipe feed. Persisted alongside the feature lookups when that cache is enabled
+if settings.feature_cache_path:
+    _response_cache = PersistentTTLCache(settings.feature_cache_path, 'llm', maxsize=50000, ttl=7 * 86400)
+else:
+    _response_cache = TTLCache(maxsize=50000, ttl=7 * 86400)
+
+# Tag-list embeddings (unit vectors) keyed on the normalized tag text
+if settings.feature_cache_path:
+    _embedding_cache = PersistentTTLCache(settings.feature_cache_path, 'llm_embeddings', maxsize=2048, ttl=30 * 86400)
+else:
+    _embedding_cache = TTLCache(maxsize=2048, ttl=30 * 86400)
+
 # Global instance
 llm_enhancer = LLMEnhancer()
 
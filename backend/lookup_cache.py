@@ -0,0 +1,256 @@
+"""
+Lookup Cache
+Small thread-safe TTL + LRU cache for external API lookups keyed on (artist, track)
+"""
+
+import functools
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, Optional
+
+# orjson when installed (bytes in/out), stdlib json otherwise
+try:
+    import orjson
+
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    import json
+
+    def _dumps(value: Any) -> bytes:
+        return json.dumps(value).encode()
+
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()  # Sentinel so cached None results can be told apart from misses
+
+_NON_WORD = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_key(*parts: Optional[str]) -> tuple:
+    """
+    Build a cache key that ignores case, accents and punctuation
+    e.g. ("Beyoncé", "Halo!") and ("beyonce ", "halo") share an entry
+    """
+    normalized = []
+    for part in parts:
+        text = unicodedata.normalize('NFKD', part or '')
+        text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+        text = _NON_WORD.sub(' ', text.casefold())
+        normalized.append(_WHITESPACE.sub(' ', text).strip())
+    return tuple(normalized)
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 86400):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Return the cached value, or `default` if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value, evicting the least recently used entry when full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        """Drop an entry if present"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class PersistentTTLCache:
+    """
+    TTLCache in front of a SQLite file, so lookups survive restarts and are shared
+    between worker processes. Values must be JSON-serializable (None included).
+    Disk errors are logged and ignored - the in-memory layer keeps working.
+    Expired rows are kept for `stale_ttl` more seconds so get_stale() can serve them
+    while the upstream is failing (stale-if-error)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        maxsize: int = 4096,
+        ttl: float = 86400,
+        stale_ttl: float = 7 * 86400
+    ):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._local = threading.local()  # sqlite3 connections can't be shared across threads
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT, key TEXT, value BLOB, expires_at REAL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _disk_key(key: Hashable) -> str:
+        return '\x1f'.join(key) if isinstance(key, tuple) else str(key)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Memory first, then disk (promoting disk hits into memory for their remaining TTL)"""
+        value = self._memory.get(key)
+        if value is not MISSING:
+            return value
+
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (self.namespace, self._disk_key(key), time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.debug(f"Feature cache read failed: {e}")
+            return default
+
+        if row is None:
+            return default
+
+        value = _loads(row[0])
+        self._memory.set(key, value, ttl=row[1] - time.time())
+        return value
+
+    def get_stale(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Last stored value even if expired (up to `stale_ttl` past expiry), or `default`"""
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (self.namespace, self._disk_key(key), time.time() - self.stale_ttl)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.debug(f"Feature cache read failed: {e}")
+            return default
+
+        return default if row is None else _loads(row[0])
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        self._memory.set(key, value, ttl=ttl)
+
+        try:
+            connection = self._connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, self._disk_key(key), _dumps(value), time.time() + ttl)
+            )
+            connection.commit()
+        except sqlite3.Error as e:
+            logger.debug(f"Feature cache write failed: {e}")
+
+    def clear(self):
+        self._memory.clear()
+        try:
+            connection = self._connection()
+            connection.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+            connection.commit()
+        except sqlite3.Error as e:
+            logger.debug(f"Feature cache clear failed: {e}")
+
+
+def memoize(cache, miss_ttl: Optional[float] = None) -> Callable:
+    """
+    Cache a lookup function of string arguments in `cache`, keyed with normalize_key()
+    None results are cached too (for `miss_ttl` seconds when given) so obscure tracks
+    don't hit the network on every call. Dict results are handed out as shallow copies
+    so callers can annotate them without touching the cached entry.
+    Concurrent misses for the same key are coalesced (singleflight): the first caller
+    does the lookup and the others wait for its result instead of repeating it.
+    If the lookup raises and the cache supports get_stale(), an expired entry is
+    served instead (stale-if-error) - it is not re-cached, so the next call retries
+    """
+    def decorator(func: Callable) -> Callable:
+        inflight = {}
+        inflight_lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            key = normalize_key(*args)
+            value = cache.get(key)
+            if value is MISSING:
+                with inflight_lock:
+                    future = inflight.get(key)
+                    leader = future is None
+                    if leader:
+                        future = inflight[key] = Future()
+
+                if leader:
+                    try:
+                        value = func(*args)
+                        cache.set(key, value, ttl=miss_ttl if value is None else None)
+                        future.set_result(value)
+                    except Exception as e:
+                        value = cache.get_stale(key) if hasattr(cache, 'get_stale') else MISSING
+                        if value is MISSING:
+                            future.set_exception(e)
+                            raise
+                        logger.debug(f"Serving stale {func.__name__} result after error: {e}")
+                        future.set_result(value)
+                    except BaseException as e:
+                        future.set_exception(e)
+                        raise
+                    finally:
+                        with inflight_lock:
+                            del inflight[key]
+                else:
+                    value = future.result()
+            return dict(value) if isinstance(value, dict) else value
+
+        def peek(*args):
+            """Cached result for these arguments without calling through (MISSING if absent)"""
+            value = cache.get(normalize_key(*args))
+            return dict(value) if isinstance(value, dict) else value
+
+        wrapper.cache = cache
+        wrapper.peek = peek
+        return wrapper
+    return decorator
@@ -1,8 +1,12 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from config import settings
 from database import init_db
 from routes import search, recommendations, user, fast_recommendations
 import logging
+import threading
 
 # Configure logging
 logging.basicConfig(
@@ -12,11 +16,40 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize database (and optionally warm up the LLM) on startup, release LLM connections on shutdown"""
+    from llm_enhancements import llm_enhancer, close_clients
+    
+    logger.info("Initializing database...")
+    init_db()
+    logger.info("Database initialized successfully")
+    
+    # Opt-in (LLM_WARM_UP): load the local LLM now rather than on the first request that needs
+    # it - in the background, since no route needs it at startup and a stuck server must not block boot
+    if settings.llm_warm_up:
+        def warm_up_llm():
+            try:
+                llm_enhancer.warm_up()
+            except Exception as e:
+                logger.warning(f"LLM warm-up failed: {e}")
+        
+        threading.Thread(target=warm_up_llm, name='llm-warm-up', daemon=True).start()
+    
+    yield
+    
+    close_clients()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Music Swipe Recommendation API",
     description="API for music discovery with swipe-based recommendations",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson encodes the float-heavy recommendation payloads in C, several times faster than stdlib json
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -35,14 +68,6 @@ app.include_router(fast_recommendations.router)
 app.include_router(user.router)
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database on startup"""
-    logger.info("Initializing database...")
-    init_db()
-    logger.info("Database initialized successfully")
-
-
 @app.get("/")
 async def root():
     return {
@@ -50,6 +50,10 @@ class SwipeRequest(BaseModel):
     track_metadata: Dict
 
 
+class SwipeBatchRequest(BaseModel):
+    swipes: List[SwipeRequest]
+
+
 class UserRegister(BaseModel):
     username: str
     password: str
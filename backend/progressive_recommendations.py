@@ -3,29 +3,188 @@ Progressive Recommendation System
 Returns recommendations quickly, enriches features in background
 """
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from spotify_client import spotify_client
 from lastfm_client import lastfm_client
+from lookup_cache import TTLCache, MISSING
 from recommendation_engine import (
     calculate_similarity_score,
     extract_year_from_date,
+    normalize_audio_features,
+    apply_feature_weights,
+    feature_similarities,
     jaccard_similarity,
+    tag_set,
+    TagEncoder,
+    mask_jaccard,
     calculate_temporal_similarity,
-    calculate_popularity_adjustment
+    calculate_popularity_adjustment,
+    get_rejected_song_ids,
+    get_liked_song_ids,
+    get_liked_song_keys
 )
 import logging
+from bisect import bisect_right
+from collections import Counter, deque
+from heapq import merge
+from itertools import count, islice
 from concurrent.futures import ThreadPoolExecutor
+import threading
 import time
 
 logger = logging.getLogger(__name__)
 
 
+def _user_swipe_sets(user_id: int) -> Tuple[frozenset, frozenset, frozenset]:
+    """
+    (rejected ids, liked ids, liked "name|artist" keys) for a user
+    Cached briefly so back-to-back requests skip the three swipe-history queries
+    """
+    cached = _user_swipes.get(user_id)
+    if cached is not MISSING:
+        return cached
+    
+    swipe_sets = (
+        frozenset(get_rejected_song_ids(user_id)),
+        frozenset(get_liked_song_ids(user_id)),
+        frozenset(get_liked_song_keys(user_id))
+    )
+    _user_swipes.set(user_id, swipe_sets)
+    return swipe_sets
+
+
+def invalidate_user_swipes(user_id: Optional[int]):
+    """Forget a user's cached swipe sets and results - call after recording or deleting their swipes"""
+    if user_id:
+        _user_swipes.delete(user_id)
+        _bump_swipe_generation(user_id)
+
+
+def _bump_swipe_generation(user_id: int):
+    """
+    Move a user to a new swipe generation, so results cached under the old one are never served
+    Entries are only dropped once every result keyed by them has expired - never to make room -
+    so a busy process can't push a user back to an old generation and revive a stale batch
+    """
+    global _generations_prune_at
+    now = time.monotonic()
+    with _generations_lock:
+        _swipe_generations[user_id] = (next(_generation_counter), now)
+        if len(_swipe_generations) >= _generations_prune_at:
+            cutoff = now - _GENERATION_TTL
+            for stale_user in [uid for uid, (_, bumped_at) in _swipe_generations.items() if bumped_at < cutoff]:
+                del _swipe_generations[stale_user]
+            # Amortized: the next sweep waits until the map has doubled again
+            _generations_prune_at = max(_GENERATIONS_PRUNE_MIN, 2 * len(_swipe_generations))
+
+
+def _search(query: str, limit: int) -> List[Dict]:
+    """spotify_client.search_tracks with the dedup keys attached as tracks come in"""
+    return [_with_keys(track) for track in spotify_client.search_tracks(query, limit=limit)]
+
+
+def _search_many(queries: List[str], limit: int) -> List[List[Dict]]:
+    """
+    _search for many queries at once, results in query order
+    A query that fails yields [] instead of aborting the rest of the batch
+    """
+    futures = [_executor.submit(_search, query, limit) for query in queries]
+    results = []
+    for query, future in zip(queries, futures):
+        try:
+            results.append(future.result())
+        except Exception as e:
+            logger.debug(f"Failed to search for {query}: {e}")
+            results.append([])
+    return results
+
+
+def _quick_score(lastfm_score: float, jaccard_sim: float, artist_match: float, temporal: float, pop_adj: float) -> float:
+    """
+    Quick score (100% - balanced for relevance AND variety)
+    Prioritize Last.fm and genre matching, moderate artist boost
+    """
+    return (
+        0.40 * lastfm_score +  # Increased - Last.fm is most reliable
+        0.25 * jaccard_sim +   # Increased - genre matching is important
+        0.12 * artist_match +  # Reduced from 20% - still important but allows variety
+        0.08 * temporal +
+        0.08 * pop_adj +
+        0.07 * (1.0 if artist_match > 0.5 else 0.0)  # Small extra boost for same/partial artist (reduced from 15%)
+    )
+
+
+def _full_score(
+    audio_sims: Tuple[float, float, float],
+    lastfm_score: float,
+    jaccard_sim: float,
+    temporal: float,
+    pop_adj: float
+) -> float:
+    """Full score once audio features are in: audio similarity (45%) on top of the metadata terms"""
+    cos_sim, euc_sim, man_sim = audio_sims
+    feature_score = 0.27 * cos_sim + 0.11 * euc_sim + 0.07 * man_sim
+    return (
+        0.45 * feature_score +
+        0.30 * lastfm_score +
+        0.20 * jaccard_sim +
+        0.025 * temporal +
+        0.025 * pop_adj
+    )
+
+
+def _add_deezer_previews(tracks: List[Dict]):
+    """
+    Try Deezer for tracks Spotify has no preview for (for recommendations only!)
+    Only runs on the tracks actually returned, with the lookups made concurrently
+    """
+    missing = [t for t in tracks if not t['preview_url']]
+    if not missing:
+        return
+    
+    from deezer_client import deezer_client
+    futures = [_executor.submit(deezer_client.get_preview_url, t['name'], t['artist']) for t in missing]
+    for track, future in zip(missing, futures):
+        try:
+            deezer_url = future.result()
+        except Exception as e:
+            logger.debug(f"Deezer fallback failed for {track['name']}: {e}")
+            continue
+        if deezer_url:
+            track['preview_url'] = deezer_url
+            logger.info(f"Got Deezer preview for recommendation: {track['name']}")
+
+
+def _with_keys(track: Dict) -> Dict:
+    """Attach the lowercased artist and "name|artist" dedup key once, so later passes don't re-lowercase"""
+    track['_artist_lc'] = track['artist'].lower()
+    track['_song_key'] = f"{track['name'].lower().strip()}|{track['_artist_lc']}"
+    return track
+
+
 def get_fast_recommendations(seed_id: str, user_id: Optional[int] = None, limit: int = 50) -> List[Dict]:
     """
     Fast recommendation system - returns initial batch immediately
     Audio features enriched progressively in background
     Uses user preferences if available
+    Repeat requests (retries, refreshes, several tabs) within a minute reuse the last
+    result - a user's new swipes bump their generation so they never see a stale batch
+    Callers get their own copies of the track dicts - background enrichment mutates them
+    in place, which must not leak into the cached batch or other requests' copies
     """
+    cache_key = (seed_id, user_id, limit, _swipe_generations.get(user_id, _NO_GENERATION)[0])
+    cached = _results.get(cache_key)
+    if cached is not MISSING:
+        logger.info(f"Serving cached FAST recommendations for {seed_id}, user {user_id}")
+        return [dict(track) for track in cached]
+    
+    result = _build_fast_recommendations(seed_id, user_id, limit)
+    if result:
+        _results.set(cache_key, result)
+    return [dict(track) for track in result]
+
+
+def _build_fast_recommendations(seed_id: str, user_id: Optional[int], limit: int) -> List[Dict]:
     logger.info(f"Getting FAST recommendations for {seed_id}, user {user_id}")
     
     # Get user preferences and rejected songs if user_id provided
@@ -33,12 +192,29 @@ def get_fast_recommendations(seed_id: str, user_id: Optional[int] = None, limit:
     liked_ids = set()
     liked_song_keys = set()
     if user_id:
-        from recommendation_engine import get_rejected_song_ids, get_liked_song_ids, get_liked_song_keys
-        rejected_ids = set(get_rejected_song_ids(user_id))
-        liked_ids = set(get_liked_song_ids(user_id))
-        liked_song_keys = get_liked_song_keys(user_id)
+        rejected_ids, liked_ids, liked_song_keys = _user_swipe_sets(user_id)
         logger.info(f"User {user_id} has rejected {len(rejected_ids)} songs and liked {len(liked_ids)} songs")
     
+    # Per-request memos - candidates share artists (and repeat songs across versions),
+    # so each artist/track is only looked up once while building this batch
+    genre_cache: Dict[str, List[str]] = {}
+    tag_cache: Dict[tuple, List[str]] = {}
+    
+    def genres_for(artist_id: str) -> List[str]:
+        if artist_id not in genre_cache:
+            genre_cache[artist_id] = spotify_client.get_artist_genres(artist_id)
+        return genre_cache[artist_id]
+    
+    def tags_for(artist: str, name: str) -> List[str]:
+        key = (artist.lower(), name.lower())
+        if key not in tag_cache:
+            try:
+                tag_cache[key] = lastfm_client.get_track_tags(artist, name)
+            except Exception as e:
+                logger.debug(f"Last.fm tags failed for {artist} - {name}: {e}")
+                tag_cache[key] = []
+        return tag_cache[key]
+    
     # 1. Get seed track (fast - cached by Spotify)
     if not spotify_client.client:
         logger.error("Spotify client not initialized. Cannot get recommendations.")
@@ -49,22 +225,23 @@ def get_fast_recommendations(seed_id: str, user_id: Optional[int] = None, limit:
         logger.warning(f"Seed track {seed_id} not found in Spotify")
         raise ValueError(f"Seed track {seed_id} not found. Please try a different song.")
     
-    # 2. Get seed metadata (fast)
+    # 2 + 3. Seed metadata and Last.fm candidates only depend on the seed track,
+    # so all of them (and the same-artist search used below) are fetched at once
+    logger.info("Getting candidates from Last.fm...")
+    similar_future = _executor.submit(lastfm_client.get_similar_tracks, seed_track['artist'], seed_track['name'], 50)
+    tags_future = _executor.submit(tags_for, seed_track['artist'], seed_track['name'])
+    genre_futures = [_executor.submit(genres_for, artist_id) for artist_id in seed_track['artist_ids']]
+    artist_future = _executor.submit(_search, f"artist:{seed_track['artist']}", 50)  # Increased from 20
+    
     seed_genres = []
-    for artist_id in seed_track['artist_ids']:
-        seed_genres.extend(spotify_client.get_artist_genres(artist_id))
+    for genre_future in genre_futures:
+        seed_genres.extend(genre_future.result())
     
-    seed_lastfm_tags = lastfm_client.get_track_tags(seed_track['artist'], seed_track['name'])
+    seed_lastfm_tags = tags_future.result()
     seed_year = extract_year_from_date(seed_track['release_date'])
     seed_pop = seed_track['popularity']
     
-    # 3. Get candidate tracks from Last.fm (PRIMARY SOURCE - fast!)
-    logger.info("Getting candidates from Last.fm...")
-    lastfm_similar = lastfm_client.get_similar_tracks(
-        seed_track['artist'],
-        seed_track['name'],
-        limit=50
-    )
+    lastfm_similar = similar_future.result()
     
     logger.info(f"Last.fm returned {len(lastfm_similar)} similar tracks")
     
@@ -81,21 +258,16 @@ def get_fast_recommendations(seed_id: str, user_id: Optional[int] = None, limit:
     # Use high-similarity tracks first, then fall back to others if needed
     tracks_to_search = high_similarity_tracks[:40] if len(high_similarity_tracks) >= 20 else lastfm_similar[:40]
     
-    for sim_track in tracks_to_search:
-        try:
-            search_query = f"{sim_track['track']} {sim_track['artist']}"
-            search_results = spotify_client.search_tracks(search_query, limit=1)
-            if search_results:
-                track = search_results[0]
-                track['lastfm_similarity'] = sim_track['similarity_score']
-                candidates.append(track)
-        except Exception as e:
-            logger.debug(f"Failed to search for {search_query}: {e}")
-            continue
+    search_queries = [f"{sim_track['track']} {sim_track['artist']}" for sim_track in tracks_to_search]
+    for sim_track, search_results in zip(tracks_to_search, _search_many(search_queries, limit=1)):
+        if search_results:
+            track = search_results[0]
+            track['lastfm_similarity'] = sim_track['similarity_score']
+            candidates.append(track)
     
     # Add same artist tracks (increased limit for more candidates)
     try:
-        artist_search = spotify_client.search_tracks(f"artist:{seed_track['artist']}", limit=50)  # Increased from 20
+        artist_search = artist_future.result()
         same_artist_count = 0
         for track in artist_search:
             if track['id'] != seed_id:
@@ -115,9 +287,8 @@ def get_fast_recommendations(seed_id: str, user_id: Optional[int] = None, limit:
         try:
             if seed_genres:
                 # Search by multiple genres for more results
-                for genre in seed_genres[:3]:
-                    genre_query = f"genre:{genre}"
-                    genre_results = spotify_client.search_tracks(genre_query, limit=30)  # Increased from 15
+                genre_queries = [f"genre:{genre}" for genre in seed_genres[:3]]
+                for genre_results in _search_many(genre_queries, limit=30):  # Increased from 15
                     for track in genre_results:
                         if track['id'] != seed_id:
                             track['lastfm_similarity'] = 0.3  # Lower score for genre matches
@@ -130,7 +301,7 @@ def get_fast_recommendations(seed_id: str, user_id: Optional[int] = None, limit:
     # Remove duplicates AND apply diversity filter AND filter rejected songs
     seen_ids = set()
     seen_songs = set()  # Track song name + artist combinations to prevent duplicate songs
-    seen_artists = {}  # Track how many songs per artist
+    artist_counts = Counter()  # Track how many songs per artist
     unique_candidates = []
     
     # Get seed artist for comparison
@@ -140,39 +311,34 @@ def get_fast_recommendations(seed_id: str, user_id: Optional[int] = None, limit:
     MAX_SAME_ARTIST = 8  # Maximum songs from seed artist (they ARE often most similar!)
     MAX_PER_ARTIST = 3   # Maximum songs from any other single artist (ensure variety)
     
+    # The seed, rejected and already-liked songs are skipped by ID and by name+artist
+    # (different versions/albums of the same song)
+    excluded_ids = rejected_ids | liked_ids | {seed_id}
+    excluded_songs = liked_song_keys | {seed_song_key}
+    
     for track in candidates:
-        # Skip if already seen by ID, is seed, was rejected, or was already liked by user
-        if track['id'] in seen_ids or track['id'] == seed_id or track['id'] in rejected_ids or track['id'] in liked_ids:
+        track_id = track['id']
+        if track_id in seen_ids or track_id in excluded_ids:
             continue
         
-        artist_name = track['artist'].lower()
-        song_name = track['name'].lower().strip()
-        song_key = f"{song_name}|{artist_name}"
-        
-        # Skip if same song name + artist (different versions/albums of same song)
-        # Also skip if user has already liked this song (by name+artist)
-        if song_key in seen_songs or song_key == seed_song_key or song_key in liked_song_keys:
-            logger.debug(f"Skipping duplicate/already-liked song: {track['name']} by {track['artist']}")
+        song_key = track['_song_key']
+        if song_key in seen_songs or song_key in excluded_songs:
+            logger.debug("Skipping duplicate/already-liked song: %s by %s", track['name'], track['artist'])
             continue
         
         # Check artist diversity limits
-        if artist_name == seed_artist_name:
-            # Limit same artist as seed
-            if seen_artists.get(artist_name, 0) >= MAX_SAME_ARTIST:
-                continue  # Skip - too many from this artist
-        else:
-            # Limit other artists too
-            if seen_artists.get(artist_name, 0) >= MAX_PER_ARTIST:
-                continue  # Skip - too many from this artist
+        artist_name = track['_artist_lc']
+        if artist_counts[artist_name] >= (MAX_SAME_ARTIST if artist_name == seed_artist_name else MAX_PER_ARTIST):
+            continue  # Skip - too many from this artist
         
         # Add track
-        seen_ids.add(track['id'])
-        seen_songs.add(song_key)  # Track by name+artist to prevent duplicates
-        seen_artists[artist_name] = seen_artists.get(artist_name, 0) + 1
+        seen_ids.add(track_id)
+        seen_songs.add(song_key)
+        artist_counts[artist_name] += 1
         unique_candidates.append(track)
     
     logger.info(f"Got {len(unique_candidates)} unique candidates with diversity filter")
-    logger.info(f"Artists represented: {len(seen_artists)}")
+    logger.info(f"Artists represented: {len(artist_counts)}")
     if user_id:
         logger.info(f"Filtered out: {len(liked_ids)} liked songs by ID, {len(liked_song_keys)} by name+artist")
     
@@ -184,106 +350,70 @@ def get_fast_recommendations(seed_id: str, user_id: Optional[int] = None, limit:
         logger.warning(f"   Liked songs filtered: {len(liked_ids)} IDs, {len(liked_song_keys)} keys")
         logger.warning(f"   Rejected songs filtered: {len(rejected_ids)}")
         
-        # Keep searching until we have at least 10 candidates or run out of options
-        max_search_rounds = 5
-        search_round = 0
+        # Rounds 1-2 both draw from the same same-artist search - fetch it once
+        try:
+            expanded_artist_search = _search(f"artist:{seed_track['artist']}", limit=100)
+        except Exception as e:
+            logger.error(f"Error during expanded artist search: {e}")
+            expanded_artist_search = []
         
-        while len(unique_candidates) < 10 and search_round < max_search_rounds:
-            search_round += 1
+        def add_candidates(
+            tracks: List[Dict],
+            allow_rejected: bool,
+            similarity: float,
+            rejected_similarity: Optional[float] = None,
+            same_artist: bool = False
+        ):
+            """
+            Add tracks that aren't the seed, already a candidate or already liked (by ID or name+artist)
+            Rejected songs only get in when allow_rejected, scored rejected_similarity when given
+            """
+            for track in tracks:
+                track_id = track['id']
+                if track_id in seen_ids or track_id == seed_id or track_id in liked_ids:
+                    continue
+                is_rejected = track_id in rejected_ids
+                if is_rejected and not allow_rejected:
+                    continue
+                
+                song_key = track['_song_key']
+                if song_key in seen_songs or song_key in excluded_songs:
+                    continue
+                
+                track['lastfm_similarity'] = rejected_similarity if is_rejected and rejected_similarity is not None else similarity
+                if same_artist:
+                    track['is_same_artist'] = True
+                seen_ids.add(track_id)
+                seen_songs.add(song_key)
+                unique_candidates.append(track)
+                logger.debug("Added expanded candidate: %s by %s", track['name'], track['artist'])
+        
+        # Keep searching until we have at least 10 candidates or run out of options
+        for search_round in range(1, 4):
             logger.info(f"Expanded search round {search_round}...")
             
             try:
-                # Round 1: More tracks from same artist (PRIORITY - these are most relevant)
-                # Only use this if we have very few candidates, prioritize same-artist
                 if search_round == 1:
-                    expanded_artist_search = spotify_client.search_tracks(f"artist:{seed_track['artist']}", limit=100)
-                    for track in expanded_artist_search:
-                        if track['id'] not in seen_ids and track['id'] != seed_id:
-                            # Round 1: Only allow if not liked and not rejected (strict)
-                            if track['id'] not in liked_ids and track['id'] not in rejected_ids:
-                                artist_name = track['artist'].lower()
-                                song_name = track['name'].lower().strip()
-                                song_key = f"{song_name}|{artist_name}"
-                                
-                                if song_key not in seen_songs and song_key != seed_song_key and song_key not in liked_song_keys:
-                                    # Give same-artist tracks a good similarity score
-                                    track['lastfm_similarity'] = 0.5  # Moderate score for same-artist
-                                    track['is_same_artist'] = True
-                                    seen_ids.add(track['id'])
-                                    seen_songs.add(song_key)
-                                    unique_candidates.append(track)
-                                    logger.debug(f"Added expanded same-artist candidate: {track['name']} by {track['artist']}")
-                
-                # Round 2: Still prioritize same-artist, but allow rejected songs
-                if search_round == 2:
-                    expanded_artist_search = spotify_client.search_tracks(f"artist:{seed_track['artist']}", limit=100)
-                    for track in expanded_artist_search:
-                        if track['id'] not in seen_ids and track['id'] != seed_id:
-                            # Round 2: Allow rejected songs for same-artist only
-                            if track['id'] not in liked_ids:
-                                artist_name = track['artist'].lower()
-                                song_name = track['name'].lower().strip()
-                                song_key = f"{song_name}|{artist_name}"
-                                
-                                if song_key not in seen_songs and song_key != seed_song_key and song_key not in liked_song_keys:
-                                    track['lastfm_similarity'] = 0.4  # Lower score for rejected songs
-                                    track['is_same_artist'] = True
-                                    seen_ids.add(track['id'])
-                                    seen_songs.add(song_key)
-                                    unique_candidates.append(track)
-                                    logger.debug(f"Added expanded same-artist candidate (round 2): {track['name']} by {track['artist']}")
-                
-                # Round 3+: Genre searches (only if we still need more)
-                # Only use top genres to maintain relevance
-                if search_round >= 3 and seed_genres and len(unique_candidates) < 10:
-                    for genre in seed_genres[:2]:  # Only top 2 genres to maintain relevance
-                        genre_search = spotify_client.search_tracks(f"genre:{genre}", limit=30)  # Reduced from 50
-                        for track in genre_search:
-                            if track['id'] not in seen_ids and track['id'] != seed_id:
-                                # In round 3+, allow rejected songs but prioritize non-rejected
-                                if track['id'] not in liked_ids:
-                                    artist_name = track['artist'].lower()
-                                    song_name = track['name'].lower().strip()
-                                    song_key = f"{song_name}|{artist_name}"
-                                    
-                                    if song_key not in seen_songs and song_key != seed_song_key and song_key not in liked_song_keys:
-                                        # Give genre matches a lower score
-                                        track['lastfm_similarity'] = 0.25 if track['id'] in rejected_ids else 0.3
-                                        seen_ids.add(track['id'])
-                                        seen_songs.add(song_key)
-                                        unique_candidates.append(track)
-                                        logger.debug(f"Added genre candidate: {track['name']} by {track['artist']}")
-                
-                logger.info(f"After search round {search_round}: {len(unique_candidates)} candidates")
-                
-                # If we have enough candidates, break early
-                if len(unique_candidates) >= 10:
-                    break
-                    
+                    # Round 1: More tracks from same artist (PRIORITY - these are most relevant)
+                    # Only allow if not liked and not rejected (strict), with a moderate score
+                    add_candidates(expanded_artist_search, allow_rejected=False, similarity=0.5, same_artist=True)
+                elif search_round == 2:
+                    # Round 2: Still prioritize same-artist, but allow rejected songs (lower score)
+                    add_candidates(expanded_artist_search, allow_rejected=True, similarity=0.4, same_artist=True)
+                elif seed_genres:
+                    # Round 3: Genre searches - only top 2 genres to maintain relevance
+                    # Rejected songs allowed, genre matches get a lower score
+                    genre_queries = [f"genre:{genre}" for genre in seed_genres[:2]]
+                    for genre_search in _search_many(genre_queries, limit=30):  # Reduced from 50
+                        add_candidates(genre_search, allow_rejected=True, similarity=0.3, rejected_similarity=0.25)
             except Exception as e:
                 logger.error(f"Error during expanded search round {search_round}: {e}")
-        
-        # Final fallback: If we still have very few candidates, allow some rejected songs
-        if len(unique_candidates) < 5:
-            logger.warning(f"Only {len(unique_candidates)} candidates after aggressive search. Allowing some rejected songs as last resort...")
-            # Re-search and allow rejected songs (but still filter liked songs)
-            try:
-                fallback_search = spotify_client.search_tracks(f"artist:{seed_track['artist']}", limit=100)
-                for track in fallback_search:
-                    if track['id'] not in seen_ids and track['id'] != seed_id and track['id'] not in liked_ids:
-                        artist_name = track['artist'].lower()
-                        song_name = track['name'].lower().strip()
-                        song_key = f"{song_name}|{artist_name}"
-                        
-                        if song_key not in seen_songs and song_key != seed_song_key and song_key not in liked_song_keys:
-                            seen_ids.add(track['id'])
-                            seen_songs.add(song_key)
-                            unique_candidates.append(track)
-                            if len(unique_candidates) >= 10:
-                                break
-                logger.info(f"After fallback search: {len(unique_candidates)} candidates")
-            except Exception as e:
-                logger.error(f"Error during fallback search: {e}")
+            
+            logger.info(f"After search round {search_round}: {len(unique_candidates)} candidates")
+            
+            # If we have enough candidates, break early
+            if len(unique_candidates) >= 10:
+                break
         
         # If we still have no candidates, we have a serious problem
         if len(unique_candidates) == 0:
@@ -297,111 +427,143 @@ def get_fast_recommendations(seed_id: str, user_id: Optional[int] = None, limit:
         logger.warning(f"   This might be due to aggressive filtering or limited Last.fm results")
     
     # 4. Quick scoring (no audio features yet!)
-    scored_tracks = []
-    
-    for track in unique_candidates:
+    # Seed tags are the same for every candidate - encode them (and build the top-genre
+    # set used for the genre-only artist match) once. Tags are bits in a per-request
+    # vocabulary, so each overlap is an int & and | plus two popcounts
+    tag_bits = TagEncoder()
+    seed_tag_mask = tag_bits.encode(seed_genres + seed_lastfm_tags)
+    seed_top_genres = frozenset(seed_genres[:3])
+    genre_masks: Dict[str, int] = {}  # Candidates share artists - encode each one's genres once
+    
+    def name_match(track_artist_lower: str) -> float:
+        """Artist match from the names alone: 1.0 same artist, 0.6 partial (featuring, duos), else 0"""
+        if track_artist_lower == seed_artist_name:
+            return 1.0
+        if seed_artist_name in track_artist_lower or track_artist_lower in seed_artist_name:
+            return 0.6
+        return 0.0
+    
+    def score_track(track: Dict) -> Dict:
         # Get basic metadata (fast - Spotify cache)
         genres = []
+        tag_mask = 0
         for artist_id in track.get('artist_ids', []):
-            genres.extend(spotify_client.get_artist_genres(artist_id))
+            genres.extend(genres_for(artist_id))
+            if artist_id not in genre_masks:
+                genre_masks[artist_id] = tag_bits.encode(genres_for(artist_id))
+            tag_mask |= genre_masks[artist_id]
         
-        # Quick Last.fm tags (skip if slow)
-        try:
-            lastfm_tags = lastfm_client.get_track_tags(track['artist'], track['name'])
-        except:
-            lastfm_tags = []
-        
-        track_year = extract_year_from_date(track['release_date'])
+        # Last.fm tags (prefetched below)
+        lastfm_tags = tags_for(track['artist'], track['name'])
+        tag_mask |= tag_bits.encode(lastfm_tags)
         
         # FAST SCORING without audio features
         # Last.fm score (40% - increased weight since it's our primary source)
         lastfm_score = track.get('lastfm_similarity', 0.0)
         
         # Genre/tag matching (25% - increased weight for better relevance)
-        all_seed_tags = seed_genres + seed_lastfm_tags
-        all_track_tags = genres + lastfm_tags
-        jaccard_sim = jaccard_similarity(all_seed_tags, all_track_tags)
+        jaccard_sim = mask_jaccard(seed_tag_mask, tag_mask)
         
         # Artist match bonus (12% - balanced for relevance but allows variety)
         # Still important but not overwhelming
-        artist_match = 0.0
-        track_artist_lower = track['artist'].lower()
-        seed_artist_lower = seed_artist_name.lower()
-        
-        # Check for exact artist match (case-insensitive)
-        if track_artist_lower == seed_artist_lower:
-            artist_match = 1.0  # Same artist - full bonus
-            logger.debug(f"Same artist match: {track['artist']} = {seed_track['artist']}")
-        elif seed_artist_lower in track_artist_lower or track_artist_lower in seed_artist_lower:
-            artist_match = 0.6  # Partial artist match (reduced from 0.8)
-            logger.debug(f"Partial artist match: {track['artist']} contains {seed_track['artist']}")
-        elif any(seed_genre in genres for seed_genre in seed_genres[:3] if seed_genres):
+        artist_match = track['_name_match']
+        if artist_match == 1.0:
+            logger.debug("Same artist match: %s = %s", track['artist'], seed_track['artist'])
+        elif artist_match:
+            logger.debug("Partial artist match: %s contains %s", track['artist'], seed_track['artist'])
+        elif not seed_top_genres.isdisjoint(genres):
             artist_match = 0.2  # Similar genre artists - smaller bonus
         
-        # Temporal (5%)
-        temporal = calculate_temporal_similarity(seed_year, track_year)
+        # Temporal (5%) and popularity (5%) - worked out with the upper bound below
+        temporal = track['_temporal']
+        pop_adj = track['_pop_adj']
         
-        # Popularity (5%)
-        pop_adj = calculate_popularity_adjustment(track['popularity'])
-        
-        # Quick score (100% - balanced for relevance AND variety)
-        # Prioritize Last.fm and genre matching, moderate artist boost
-        quick_score = (
-            0.40 * lastfm_score +  # Increased - Last.fm is most reliable
-            0.25 * jaccard_sim +   # Increased - genre matching is important
-            0.12 * artist_match +  # Reduced from 20% - still important but allows variety
-            0.08 * temporal +
-            0.08 * pop_adj +
-            0.07 * (1.0 if artist_match > 0.5 else 0.0)  # Small extra boost for same/partial artist (reduced from 15%)
-        )
+        quick_score = _quick_score(lastfm_score, jaccard_sim, artist_match, temporal, pop_adj)
         
         # Log scoring breakdown for top candidates (for debugging)
-        if len(scored_tracks) < 5:  # Log first few tracks
+        # (f-strings format eagerly, so only build these when DEBUG is on)
+        if len(scored) < 5 and logger.isEnabledFor(logging.DEBUG):  # Log first few tracks
             logger.debug(f"Score breakdown for {track['name']} by {track['artist']}:")
             logger.debug(f"  Last.fm: {lastfm_score:.3f} (35%), Genre: {jaccard_sim:.3f} (20%), Artist: {artist_match:.3f} (20%+15%), Temporal: {temporal:.3f} (5%), Pop: {pop_adj:.3f} (5%)")
             logger.debug(f"  Final score: {quick_score:.3f}")
         
-        # Try Deezer if Spotify doesn't have a preview (for recommendations only!)
-        preview_url = track['preview_url']
-        if not preview_url:
-            try:
-                from deezer_client import deezer_client
-                deezer_url = deezer_client.get_preview_url(track['name'], track['artist'])
-                if deezer_url:
-                    preview_url = deezer_url
-                    logger.info(f"Got Deezer preview for recommendation: {track['name']}")
-            except Exception as e:
-                logger.debug(f"Deezer fallback failed for {track['name']}: {e}")
-        
         # Note: audio_features will be None initially
-        scored_tracks.append({
+        return {
             'id': track['id'],
             'name': track['name'],
             'artist': track['artist'],
             'album': track['album'],
             'image_url': track['image_url'],
-            'preview_url': preview_url,  # Includes Deezer fallback
+            'preview_url': track['preview_url'],  # Deezer fallback added once the final tracks are picked
             'audio_features': None,  # Will be enriched later
             'metadata': {
                 'genres': genres,
                 'lastfm_tags': lastfm_tags,
                 'enhanced_tags': [],
-                'release_year': track_year,
+                'release_year': track['_year'],
                 'popularity': track['popularity'],
                 'lastfm_similarity': lastfm_score
             },
             'similarity_score': quick_score,
-            '_needs_enrichment': True  # Flag for background processing
-        })
-    
-    # Sort by quick score
-    scored_tracks.sort(key=lambda x: x['similarity_score'], reverse=True)
+            '_needs_enrichment': True,  # Flag for background processing
+            '_is_same_artist': seed_artist_name in track['_artist_lc']  # Classified once, reused by every split below
+        }
+    
+    def score_all(tracks: List[Dict]):
+        # Prefetch Last.fm tags for the batch concurrently (one worker per distinct song),
+        # so score_track reads them from the memo instead of waiting on each request
+        unique_songs = {(t['_artist_lc'], t['name'].lower()): t for t in tracks}
+        list(_executor.map(lambda t: tags_for(t['artist'], t['name']), unique_songs.values()))
+        for track in tracks:
+            scored[track['id']] = score_track(track)
     
     # Filter out very low-quality matches
     # Increased threshold to 0.35 (35%) to ensure only relevant songs
     MIN_SIMILARITY_THRESHOLD = 0.35
+    
+    # Last.fm similarity, name-based artist match, era and popularity need no lookups, and
+    # genre/tag overlap adds at most 0.25 (plus a 0.2 genre-only artist match). Candidates whose
+    # best case is still under the threshold skip the genre/tag/Deezer work - they are only
+    # scored if too few tracks pass and the threshold has to be lowered below
+    likely_tracks = []
+    unlikely_tracks = []
+    for track in unique_candidates:
+        # These terms are kept on the track so score_track doesn't work them out again
+        track['_year'] = extract_year_from_date(track['release_date'])
+        track['_temporal'] = calculate_temporal_similarity(seed_year, track['_year'])
+        track['_pop_adj'] = calculate_popularity_adjustment(track['popularity'])
+        track['_name_match'] = name_match(track['_artist_lc'])
+        
+        max_possible = _quick_score(
+            track.get('lastfm_similarity', 0.0),
+            1.0,
+            track['_name_match'] or 0.2,
+            track['_temporal'],
+            track['_pop_adj']
+        )
+        (likely_tracks if max_possible >= MIN_SIMILARITY_THRESHOLD else unlikely_tracks).append(track)
+    
+    scored: Dict[str, Dict] = {}
+    score_all(likely_tracks)
+    if unlikely_tracks:
+        n_passing = sum(1 for t in scored.values() if t['similarity_score'] >= MIN_SIMILARITY_THRESHOLD)
+        if n_passing < 5:
+            score_all(unlikely_tracks)
+        else:
+            logger.info(f"Skipped scoring {len(unlikely_tracks)} candidates that cannot reach {MIN_SIMILARITY_THRESHOLD}")
+    
+    # Candidate order breaks score ties, same as scoring them all in one pass
+    scored_tracks = [scored[t['id']] for t in unique_candidates if t['id'] in scored]
+    
+    # Sort by quick score - each threshold below is then just a cut-off point in the sorted list
+    scored_tracks.sort(key=lambda x: x['similarity_score'], reverse=True)
+    negated_scores = [-t['similarity_score'] for t in scored_tracks]  # Ascending, for bisect
+    
+    def filter_passing(threshold: float) -> List[Dict]:
+        return scored_tracks[:bisect_right(negated_scores, -threshold)]
+    
     original_count = len(scored_tracks)
-    filtered_tracks = [t for t in scored_tracks if t['similarity_score'] >= MIN_SIMILARITY_THRESHOLD]
+    filtered_tracks = filter_passing(MIN_SIMILARITY_THRESHOLD)
     
     if len(filtered_tracks) < original_count:
         removed = original_count - len(filtered_tracks)
@@ -411,11 +573,11 @@ def get_fast_recommendations(seed_id: str, user_id: Optional[int] = None, limit:
     if len(filtered_tracks) < 5 and original_count > 0:
         logger.warning(f"Only {len(filtered_tracks)} tracks passed 35% threshold! Lowering to 0.30 to get more results")
         MIN_SIMILARITY_THRESHOLD = 0.30
-        filtered_tracks = [t for t in scored_tracks if t['similarity_score'] >= MIN_SIMILARITY_THRESHOLD]
+        filtered_tracks = filter_passing(MIN_SIMILARITY_THRESHOLD)
         if len(filtered_tracks) < 3:
             logger.warning(f"Still only {len(filtered_tracks)} tracks! Lowering to 0.25")
             MIN_SIMILARITY_THRESHOLD = 0.25
-            filtered_tracks = [t for t in scored_tracks if t['similarity_score'] >= MIN_SIMILARITY_THRESHOLD]
+            filtered_tracks = filter_passing(MIN_SIMILARITY_THRESHOLD)
     
     scored_tracks = filtered_tracks
     
@@ -424,15 +586,13 @@ def get_fast_recommendations(seed_id: str, user_id: Optional[int] = None, limit:
         logger.info(f"Score range: {scored_tracks[0]['similarity_score']:.3f} (top) to {scored_tracks[-1]['similarity_score']:.3f} (bottom)")
         # Log top 3 scores for debugging
         for i, track in enumerate(scored_tracks[:3], 1):
-            logger.debug(f"  {i}. {track['name']} by {track['artist']}: {track['similarity_score']:.3f}")
+            logger.debug("  %d. %s by %s: %.3f", i, track['name'], track['artist'], track['similarity_score'])
     
     # INTERLEAVE same artist and discovery for better variety!
     # Pattern: 1 same-artist → 2 discovery → 1 same-artist → 2 discovery...
     # This ensures good variety while still including same-artist tracks
-    seed_artist_lower = seed_track['artist'].lower()
-    
-    same_artist_tracks = [t for t in scored_tracks if seed_artist_lower in t['artist'].lower()]
-    other_artist_tracks = [t for t in scored_tracks if seed_artist_lower not in t['artist'].lower()]
+    same_artist_tracks = [t for t in scored_tracks if t['_is_same_artist']]
+    other_artist_tracks = [t for t in scored_tracks if not t['_is_same_artist']]
     
     logger.info(f"Interleaving: {len(same_artist_tracks)} same-artist + {len(other_artist_tracks)} discovery")
     
@@ -444,57 +604,32 @@ def get_fast_recommendations(seed_id: str, user_id: Optional[int] = None, limit:
             logger.error("No scored tracks available! This should not happen.")
             return []
         # Always return at least what we have, up to limit
-        return scored_tracks[:limit]
+        result = scored_tracks[:limit]
+        _add_deezer_previews(result)
+        return result
     
     # Interleave: 1 same-artist → 3 discovery (aggressive variety!)
-    # Also enforce: never more than 2 same-artist tracks in a row
+    # One pass over two queues - while discovery tracks remain a same-artist track is
+    # never next to another one; once they run out the leftovers are filled in below
+    same_queue = deque(same_artist_tracks)
+    other_queue = deque(other_artist_tracks)
     interleaved = []
-    same_idx = 0
-    other_idx = 0
-    consecutive_same_artist = 0  # Track consecutive same-artist tracks
-    MAX_CONSECUTIVE_SAME = 2  # Never allow more than 2 same-artist in a row
     
-    # Continue until we've used all tracks or reached a reasonable limit
-    max_iterations = 100  # Safety limit to prevent infinite loops
-    iteration = 0
-    
-    while (same_idx < len(same_artist_tracks) or other_idx < len(other_artist_tracks)) and len(interleaved) < limit * 2 and iteration < max_iterations:
-        iteration += 1
-        
-        # FORCE other-artist track if we've had too many same-artist in a row
-        if consecutive_same_artist >= MAX_CONSECUTIVE_SAME:
-            if other_idx < len(other_artist_tracks):
-                interleaved.append(other_artist_tracks[other_idx])
-                other_idx += 1
-                consecutive_same_artist = 0  # Reset counter
-                continue  # Skip to next iteration
-            # If no other-artist tracks available, we'll add same-artist below
-        
-        # Add 1 same-artist song (if we haven't hit the consecutive limit)
-        if same_idx < len(same_artist_tracks) and consecutive_same_artist < MAX_CONSECUTIVE_SAME:
-            interleaved.append(same_artist_tracks[same_idx])
-            same_idx += 1
-            consecutive_same_artist += 1
-        elif same_idx < len(same_artist_tracks):
-            # We've hit the consecutive limit, skip this same-artist track
-            same_idx += 1
-            consecutive_same_artist = 0  # Reset since we're skipping
+    while other_queue and len(interleaved) < limit * 2:
+        if same_queue:
+            interleaved.append(same_queue.popleft())
         
         # Add 3 discovery songs (increased for more variety!)
-        for _ in range(3):
-            if other_idx < len(other_artist_tracks):
-                interleaved.append(other_artist_tracks[other_idx])
-                other_idx += 1
-                consecutive_same_artist = 0  # Reset counter when we add other-artist
-            else:
-                break
+        for _ in range(min(3, len(other_queue))):
+            interleaved.append(other_queue.popleft())
     
-    logger.info(f"Interleaving complete: {len(interleaved)} tracks interleaved (same: {same_idx}/{len(same_artist_tracks)}, other: {other_idx}/{len(other_artist_tracks)})")
+    logger.info(f"Interleaving complete: {len(interleaved)} tracks interleaved (same: {len(same_artist_tracks) - len(same_queue)}/{len(same_artist_tracks)}, other: {len(other_artist_tracks) - len(other_queue)}/{len(other_artist_tracks)})")
     
     # If we still don't have enough, add remaining tracks in order
     if len(interleaved) < limit:
         logger.warning(f"Only got {len(interleaved)} interleaved tracks, filling with remaining scored tracks")
-        remaining = [t for t in scored_tracks if t not in interleaved]
+        included_ids = {t['id'] for t in interleaved}
+        remaining = [t for t in scored_tracks if t['id'] not in included_ids]
         needed = limit - len(interleaved)
         interleaved.extend(remaining[:needed])
         logger.info(f"Added {min(needed, len(remaining))} remaining tracks, now have {len(interleaved)} total")
@@ -512,78 +647,66 @@ def get_fast_recommendations(seed_id: str, user_id: Optional[int] = None, limit:
         logger.warning("⚠️ No recommendations to return after interleaving!")
         return []
     
+    # Same-artist count kept alongside result so the summary below needn't rescan it
+    # (with no discovery tracks at all, every result is a same-artist track)
+    same_count = len(result)
+    
     # FORCE minimum variety: Ensure at least 50% of recommendations are from other artists
     # This prevents same-artist tracks from dominating the results
-    # Also ensure we never have more than 2 same-artist tracks in a row
     if len(result) > 0 and len(other_artist_tracks) > 0:
-        same_artist_in_result = [t for t in result if seed_artist_lower in t['artist'].lower()]
-        other_artist_in_result = [t for t in result if seed_artist_lower not in t['artist'].lower()]
+        # One pass splits result by the flag set at scoring time
+        same_artist_in_result = []
+        other_artist_in_result = []
+        for t in result:
+            (same_artist_in_result if t['_is_same_artist'] else other_artist_in_result).append(t)
+        same_count = len(same_artist_in_result)
         
         min_other_artist_count = max(3, int(len(result) * 0.5))  # At least 50% or 3 tracks, whichever is higher
         
-        # Check for consecutive same-artist tracks and break them up (do this first)
-        MAX_CONSECUTIVE_SAME = 2
-        max_iterations = 5  # Limit how many times we try to fix consecutive tracks
-        iteration = 0
-        while iteration < max_iterations:
-            found_consecutive = False
-            for i in range(len(result) - MAX_CONSECUTIVE_SAME):
-                # Check if we have 3+ same-artist tracks in a row
-                window = result[i:i+MAX_CONSECUTIVE_SAME+1]
-                same_artist_count = sum(1 for t in window if seed_artist_lower in t['artist'].lower())
-                if same_artist_count > MAX_CONSECUTIVE_SAME:
-                    # Find an other-artist track to insert
-                    available_other = [t for t in other_artist_tracks if t not in result]
-                    if available_other:
-                        # Insert an other-artist track to break up the sequence
-                        result.insert(i + MAX_CONSECUTIVE_SAME, available_other[0])
-                        logger.info(f"Broke up consecutive same-artist tracks by inserting {available_other[0]['name']} by {available_other[0]['artist']}")
-                        found_consecutive = True
-                        break  # Restart the check after insertion
-            if not found_consecutive:
-                break  # No more consecutive sequences found
-            iteration += 1
-        
-        # Recalculate counts after breaking up consecutive tracks
-        same_artist_in_result = [t for t in result if seed_artist_lower in t['artist'].lower()]
-        other_artist_in_result = [t for t in result if seed_artist_lower not in t['artist'].lower()]
-        
-        if len(other_artist_in_result) < min_other_artist_count:
+        needed_other = min_other_artist_count - len(other_artist_in_result)
+        if needed_other > 0:
             logger.info(f"Forcing variety: Only {len(other_artist_in_result)} other-artist tracks, need at least {min_other_artist_count}")
             
-            # Get additional other-artist tracks that aren't already in result
-            available_other_artist = [t for t in other_artist_tracks if t not in result]
-            
-            # Calculate how many same-artist tracks to replace
-            needed_other = min_other_artist_count - len(other_artist_in_result)
-            can_replace = min(needed_other, len(available_other_artist), len(same_artist_in_result))
+            # Get additional other-artist tracks that aren't already in result - the scan
+            # stops once there are as many as there are same-artist tracks to swap out
+            result_ids = {t['id'] for t in result}
+            new_other_artist = list(islice(
+                (t for t in other_artist_tracks if t['id'] not in result_ids),
+                min(needed_other, len(same_artist_in_result))
+            ))
+            can_replace = len(new_other_artist)
             
             if can_replace > 0:
                 # Remove some same-artist tracks from the end (lowest priority)
                 # and replace with other-artist tracks
-                result_without_same = [t for t in result if seed_artist_lower not in t['artist'].lower()]
                 same_artist_to_keep = same_artist_in_result[:-can_replace] if len(same_artist_in_result) > can_replace else []
-                new_other_artist = available_other_artist[:can_replace]
                 
                 # Rebuild result: keep all other-artist tracks, keep remaining same-artist, add new other-artist
-                result = result_without_same + same_artist_to_keep + new_other_artist
-                
-                # Re-sort by score to maintain quality
-                result.sort(key=lambda x: x.get('similarity_score', 0), reverse=True)
-                result = result[:limit]  # Trim to limit
-                
-                # Recalculate final counts after replacement
-                final_same = len([t for t in result if seed_artist_lower in t['artist'].lower()])
-                final_other = len([t for t in result if seed_artist_lower not in t['artist'].lower()])
+                # Each part is already in score order (both queues are consumed in order), so merging
+                # them keeps the result sorted by score without re-sorting the whole list
+                result = list(islice(merge(
+                    other_artist_in_result,
+                    same_artist_to_keep,
+                    new_other_artist,
+                    key=lambda x: -x.get('similarity_score', 0)
+                ), limit))
+                same_count -= can_replace
                 
-                logger.info(f"✅ Forced variety: Now have {final_other} other-artist tracks (replaced {can_replace} same-artist)")
+                # A straight swap keeps the length, so the new count follows from can_replace
+                logger.info(f"✅ Forced variety: Now have {len(other_artist_in_result) + can_replace} other-artist tracks (replaced {can_replace} same-artist)")
     
-    logger.info(f"✅ Returning {len(result)} recommendations (interleaved: {len(interleaved)}, scored: {len(scored_tracks)}, limit: {limit})")
+    # %-style args so nothing is formatted unless INFO is actually emitted
+    logger.info(
+        "✅ Returning %d recommendations (interleaved: %d, scored: %d, limit: %d)",
+        len(result), len(interleaved), len(scored_tracks), limit
+    )
     if len(result) > 0:
-        same_count = len([t for t in result if seed_artist_lower in t['artist'].lower()])
-        other_count = len([t for t in result if seed_artist_lower not in t['artist'].lower()])
-        variety_pct = (other_count / len(result) * 100) if len(result) > 0 else 0.0
-        logger.info(f"   Final mix: {same_count} same-artist, {other_count} other-artist ({variety_pct:.1f}% variety)")
+        if logger.isEnabledFor(logging.INFO):
+            other_count = len(result) - same_count
+            logger.info(
+                "   Final mix: %d same-artist, %d other-artist (%.1f%% variety)",
+                same_count, other_count, other_count / len(result) * 100
+            )
     else:
         logger.warning("   No recommendations to return!")
     
@@ -591,85 +714,119 @@ def get_fast_recommendations(seed_id: str, user_id: Optional[int] = None, limit:
         logger.warning(f"⚠️ Only returning {len(result)} recommendations! This may indicate filtering is too aggressive or not enough candidates were found.")
         logger.warning(f"   Candidates collected: {len(candidates)}, Unique after filter: {len(unique_candidates)}, Scored: {len(scored_tracks)}")
     
+    _add_deezer_previews(result)
     return result
 
 
-def enrich_track_features(track: Dict, seed_features: Optional[Dict] = None) -> Dict:
-    """
-    Enrich a track with full audio features (call this in background)
-    Recalculates similarity score with audio data
-    """
-    try:
-        # Get audio features (this is the slow part - 5-10 seconds)
-        features = spotify_client.get_audio_features(track['id'])
+def _apply_features(
+    track: Dict,
+    features: Dict,
+    seed_vec: Optional[List[float]] = None,
+    seed_tags: Optional[frozenset] = None
+):
+    """Store fetched audio features on a track and, given the seed vector, rescore it (CPU only)"""
+    track['audio_features'] = features
+    track['_needs_enrichment'] = False
+    
+    # If we have seed features, recalculate full score
+    if seed_vec:
+        # Now calculate full score with audio features (45%)
+        track_vec = apply_feature_weights(normalize_audio_features(features))
         
-        if features:
-            track['audio_features'] = features
-            track['_needs_enrichment'] = False
-            
-            # If we have seed features, recalculate full score
-            if seed_features:
-                # Now calculate full score with audio features (45%)
-                from recommendation_engine import (
-                    normalize_audio_features,
-                    apply_feature_weights,
-                    cosine_similarity,
-                    euclidean_similarity,
-                    manhattan_similarity
-                )
-                
-                track_vec = apply_feature_weights(normalize_audio_features(features))
-                seed_vec = apply_feature_weights(normalize_audio_features(seed_features))
-                
-                # Audio similarities
-                cos_sim = cosine_similarity(track_vec, seed_vec)
-                euc_sim = euclidean_similarity(track_vec, seed_vec)
-                man_sim = manhattan_similarity(track_vec, seed_vec)
-                feature_score = 0.27 * cos_sim + 0.11 * euc_sim + 0.07 * man_sim
-                
-                # Combine with existing scores
-                metadata = track['metadata']
-                
-                # Genre/tag score (already calculated)
-                seed_tags = []  # Would need to pass this in
-                track_tags = metadata.get('genres', []) + metadata.get('lastfm_tags', [])
-                jaccard_sim = jaccard_similarity(seed_tags, track_tags) if seed_tags else 0.2
-                
-                # Full score with audio
-                full_score = (
-                    0.45 * feature_score +
-                    0.30 * metadata['lastfm_similarity'] +
-                    0.20 * jaccard_sim +
-                    0.025 * calculate_temporal_similarity(2020, metadata['release_year']) +
-                    0.025 * calculate_popularity_adjustment(metadata['popularity'])
-                )
-                
-                track['similarity_score'] = full_score
+        # Combine with existing scores
+        metadata = track['metadata']
         
-        return track
+        # Genre/tag score - only the track's side is built here, the seed set is shared
+        if seed_tags:
+            track_tags = metadata.get('genres', []) + metadata.get('lastfm_tags', [])
+            jaccard_sim = jaccard_similarity(seed_tags, track_tags)
+        else:
+            jaccard_sim = 0.2
         
-    except Exception as e:
-        logger.error(f"Error enriching track {track['id']}: {e}")
-        track['_needs_enrichment'] = False
-        return track
+        # Full score with audio (similarities in one pass over both vectors)
+        track['similarity_score'] = _full_score(
+            feature_similarities(track_vec, seed_vec),
+            metadata['lastfm_similarity'],
+            jaccard_sim,
+            calculate_temporal_similarity(2020, metadata['release_year']),
+            calculate_popularity_adjustment(metadata['popularity'])
+        )
 
 
-def enrich_batch_async(tracks: List[Dict], batch_size: int = 10, seed_features: Optional[Dict] = None):
+def enrich_batch_async(
+    tracks: List[Dict],
+    batch_size: int = 10,
+    seed_features: Optional[Dict] = None,
+    seed_tags: Optional[List[str]] = None
+):
     """
-    Enrich a batch of tracks in parallel
+    Enrich a batch of tracks
     Call this in background while user swipes
+    Features for the whole batch come from one bulk lookup, then each track is rescored locally
     """
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = []
-        for track in tracks[:batch_size]:
-            if track.get('_needs_enrichment'):
-                future = executor.submit(enrich_track_features, track, seed_features)
-                futures.append(future)
-        
-        # Wait for all to complete
-        for future in futures:
-            try:
-                future.result(timeout=15)  # 15 second timeout per track
-            except Exception as e:
-                logger.warning(f"Track enrichment failed: {e}")
+    pending = [track for track in tracks[:batch_size] if track.get('_needs_enrichment')]
+    if not pending:
+        return
+    
+    # The seed side is the same for every track - normalize and weight it once per batch
+    seed_vec = None
+    if seed_features:
+        seed_vec = apply_feature_weights(normalize_audio_features(seed_features))
+    seed_tag_set = tag_set(seed_tags) if seed_tags else None
+    
+    for track, features in zip(pending, spotify_client.get_audio_features_batch(pending)):
+        if not features:
+            continue
+        try:
+            _apply_features(track, features, seed_vec, seed_tag_set)
+        except Exception as e:
+            logger.warning(f"Track enrichment failed for {track['id']}: {e}")
+            track['_needs_enrichment'] = False
+
+
+def enrich_batch_for_seed(tracks: List[Dict], seed_id: str, batch_size: int = 10):
+    """
+    enrich_batch_async rescored against a seed track - looks up the seed's audio features,
+    artist genres and Last.fm tags first (all cached by their clients, so a seed that was
+    just recommended from costs little). Meant to run as a background task after the response
+    """
+    if not any(track.get('_needs_enrichment') for track in tracks[:batch_size]):
+        return
+    
+    seed_features = None
+    seed_tags: List[str] = []
+    try:
+        seed_track = spotify_client.get_track(seed_id)
+        if seed_track:
+            seed_features = spotify_client.get_audio_features(seed_id)
+            for artist_id in seed_track['artist_ids']:
+                seed_tags.extend(spotify_client.get_artist_genres(artist_id))
+            seed_tags.extend(lastfm_client.get_track_tags(seed_track['artist'], seed_track['name']))
+    except Exception as e:
+        # Still fetch the tracks' features - they just keep their quick scores
+        logger.warning(f"Seed lookup for enrichment failed for {seed_id}: {e}")
+    
+    enrich_batch_async(tracks, batch_size, seed_features=seed_features, seed_tags=seed_tags)
+
+
+
+# Per-user rejected/liked sets - swipe routes invalidate them, the TTL covers other workers
+_user_swipes = TTLCache(maxsize=1024, ttl=30)
+
+# Recent results keyed by (seed_id, user_id, limit, swipe generation)
+_results = TTLCache(maxsize=256, ttl=60)
+
+# user_id -> (swipe generation, monotonic time of the bump). Generations come from one global
+# counter, so a later bump never reuses a value. An entry is kept for twice the results TTL
+# (covering a batch that was still being built when the swipe landed), after which every
+# result keyed by it has expired and the user can safely fall back to generation 0
+_swipe_generations: Dict[int, Tuple[int, float]] = {}
+_generations_lock = threading.Lock()
+_generation_counter = count(1)
+_NO_GENERATION = (0, 0.0)
+_GENERATION_TTL = 2 * _results.ttl
+_GENERATIONS_PRUNE_MIN = 4096
+_generations_prune_at = _GENERATIONS_PRUNE_MIN
 
+# Shared pool for concurrent Spotify searches - sized to spotipy's connection pool
+_executor = ThreadPoolExecutor(max_workers=10, thread_name_prefix='progressive')
@@ -1,4 +1,4 @@
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Union
 from spotify_client import spotify_client
 from lastfm_client import lastfm_client
 from database import SessionLocal, SwipeHistory, UserPreferences
@@ -7,6 +7,7 @@ from simple_math import (
     cosine_similarity as cosine_sim_math,
     euclidean_similarity as euclidean_sim_math,
     manhattan_similarity as manhattan_sim_math,
+    similarity_triple,
     mean,
     variance
 )
@@ -111,20 +112,63 @@ def manhattan_similarity(vec_a: List[float], vec_b: List[float]) -> float:
     return manhattan_sim_math(vec_a, vec_b)
 
 
-def jaccard_similarity(set_a: List[str], set_b: List[str]) -> float:
-    """Calculate Jaccard similarity for tags/genres"""
+def feature_similarities(vec_a: List[float], vec_b: List[float]) -> Tuple[float, float, float]:
+    """Cosine, euclidean and manhattan similarity together, computed in one pass"""
+    return similarity_triple(vec_a, vec_b)
+
+
+def tag_set(tags: List[str]) -> frozenset:
+    """Lowercased tag set - build once for a seed and reuse it for every candidate"""
+    return frozenset(tag.lower() for tag in tags)
+
+
+def jaccard_similarity(set_a: Union[List[str], frozenset], set_b: Union[List[str], frozenset]) -> float:
+    """
+    Calculate Jaccard similarity for tags/genres
+    Either side may already be a tag_set() (not rebuilt); lists are lowercased first
+    """
     if not set_a or not set_b:
         return 0.0
     
-    set_a = set([tag.lower() for tag in set_a])
-    set_b = set([tag.lower() for tag in set_b])
+    if not isinstance(set_a, frozenset):
+        set_a = tag_set(set_a)
+    if not isinstance(set_b, frozenset):
+        set_b = tag_set(set_b)
     
     intersection = len(set_a & set_b)
-    union = len(set_a | set_b)
+    union = len(set_a) + len(set_b) - intersection
     
     return intersection / union if union > 0 else 0.0
 
 
+class TagEncoder:
+    """
+    Maps lowercased tags to bit positions so a tag set becomes a single int bitmask
+    Python ints are unbounded, so there is no 64-tag limit and no overflow set.
+    The vocabulary only grows - keep one per seed/request, not one per process
+    """
+    
+    def __init__(self):
+        self._bits: Dict[str, int] = {}
+    
+    def encode(self, tags: List[str]) -> int:
+        mask = 0
+        for tag in tags:
+            tag = tag.lower()
+            bit = self._bits.get(tag)
+            if bit is None:
+                bit = self._bits[tag] = 1 << len(self._bits)
+            mask |= bit
+        return mask
+
+
+def mask_jaccard(mask_a: int, mask_b: int) -> float:
+    """jaccard_similarity for two TagEncoder masks from the same encoder"""
+    if not mask_a or not mask_b:
+        return 0.0
+    return (mask_a & mask_b).bit_count() / (mask_a | mask_b).bit_count()
+
+
 def calculate_temporal_similarity(year_a: int, year_b: int) -> float:
     """Calculate temporal/era similarity"""
     year_diff = abs(year_a - year_b)
@@ -172,9 +216,7 @@ def calculate_similarity_score(
     seed_vec_weighted = apply_feature_weights(seed_vec, user_weights)
     
     # Feature-based similarities (45% total)
-    cos_sim = cosine_similarity(track_vec_weighted, seed_vec_weighted)
-    euc_sim = euclidean_similarity(track_vec_weighted, seed_vec_weighted)
-    man_sim = manhattan_similarity(track_vec_weighted, seed_vec_weighted)
+    cos_sim, euc_sim, man_sim = feature_similarities(track_vec_weighted, seed_vec_weighted)
     feature_score = 0.27 * cos_sim + 0.11 * euc_sim + 0.07 * man_sim
     
     # Tag/Genre similarity (20%)
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from typing import List
 from models import RecommendationRequest, RecommendationResponse, AudioFeatures, TrackMetadata
-from progressive_recommendations import get_fast_recommendations, enrich_batch_async
+from progressive_recommendations import get_fast_recommendations, enrich_batch_for_seed
 import logging
 
 logger = logging.getLogger(__name__)
@@ -40,11 +40,12 @@ async def get_fast_track_recommendations(
                 detail="No recommendations found. The seed track may not exist or have similar tracks."
             )
         
-        # Schedule background enrichment for first 10 tracks
+        # Schedule background enrichment for first 10 tracks, rescored against the seed
         # This will run after the response is sent!
         background_tasks.add_task(
-            enrich_batch_async,
+            enrich_batch_for_seed,
             recommendations,
+            request.seed_id,
             batch_size=10
         )
         
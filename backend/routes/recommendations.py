@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from typing import List
 from sqlalchemy.orm import Session
-from models import RecommendationRequest, RecommendationResponse, AudioFeatures, TrackMetadata
+from models import RecommendationRequest, RecommendationResponse
 from recommendation_engine import get_recommendations
 from simple_recommendation_engine import get_simple_recommendations
 from database import get_db
@@ -30,24 +30,22 @@ async def get_track_recommendations(
         if not recommendations:
             raise HTTPException(status_code=404, detail="No recommendations found. Please try a different song.")
         
-        # Convert to response model
-        response = []
-        for rec in recommendations:
-            response.append(
-                RecommendationResponse(
-                    id=rec['id'],
-                    name=rec['name'],
-                    artist=rec['artist'],
-                    album=rec['album'],
-                    image_url=rec['image_url'],
-                    preview_url=rec['preview_url'],
-                    audio_features=AudioFeatures(**rec['audio_features']),
-                    metadata=TrackMetadata(**rec['metadata']),
-                    similarity_score=rec['similarity_score']
-                )
-            )
-        
-        return response
+        # Plain dicts - response_model validates and serializes them once. Returning model
+        # instances would validate each one here, then FastAPI dumps and re-validates them
+        return [
+            {
+                'id': rec['id'],
+                'name': rec['name'],
+                'artist': rec['artist'],
+                'album': rec['album'],
+                'image_url': rec['image_url'],
+                'preview_url': rec['preview_url'],
+                'audio_features': rec['audio_features'],
+                'metadata': rec['metadata'],
+                'similarity_score': rec['similarity_score']
+            }
+            for rec in recommendations
+        ]
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating recommendations: {str(e)}")
@@ -49,16 +49,17 @@ async def search_tracks(query: str, limit: int = 20):
             logger.warning(f"No results found for query: {query}")
             return []
         
+        # Plain dicts - validated and serialized once by response_model
         return [
-            TrackSearchResult(
-                id=track['id'],
-                name=track['name'],
-                artist=track['artist'],
-                album=track['album'],
-                image_url=track['image_url'],
-                preview_url=track['preview_url'],
-                popularity=track['popularity']
-            )
+            {
+                'id': track['id'],
+                'name': track['name'],
+                'artist': track['artist'],
+                'album': track['album'],
+                'image_url': track['image_url'],
+                'preview_url': track['preview_url'],
+                'popularity': track['popularity']
+            }
             for track in results
         ]
     except HTTPException:
@@ -4,9 +4,11 @@ from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
 from typing import Optional
-from models import SwipeRequest, UserRegister, UserLogin, Token
-from database import get_db, User, SwipeHistory, UserPreferences
+from collections import Counter
+from models import SwipeRequest, SwipeBatchRequest, UserRegister, UserLogin, Token
+from database import get_db, User, SwipeHistory, UserPreferences, bulk_insert_swipes
 from recommendation_engine import update_user_preferences
+from progressive_recommendations import invalidate_user_swipes
 from config import settings
 import logging
 
@@ -104,6 +106,7 @@ async def record_swipe(swipe_data: SwipeRequest, db: Session = Depends(get_db)):
     
     db.add(swipe)
     db.commit()
+    invalidate_user_swipes(swipe_data.user_id)
     
     preferences_updated = False
     
@@ -132,6 +135,33 @@ async def record_swipe(swipe_data: SwipeRequest, db: Session = Depends(get_db)):
     }
 
 
+@router.post("/swipe/batch")
+async def record_swipes(batch: SwipeBatchRequest, db: Session = Depends(get_db)):
+    """
+    Record several swipes at once
+    Clients can buffer swipes and flush them together - one INSERT and one commit for the batch
+    """
+    bulk_insert_swipes(db, [swipe.model_dump() for swipe in batch.swipes])
+    
+    preferences_updated = False
+    
+    # Same rule as single swipes: update preferences every 10 swipes per logged-in user
+    new_swipes_per_user = Counter(swipe.user_id for swipe in batch.swipes if swipe.user_id)
+    for user_id, new_swipes in new_swipes_per_user.items():
+        invalidate_user_swipes(user_id)
+        swipe_count = db.query(SwipeHistory).filter(SwipeHistory.user_id == user_id).count()
+        if swipe_count // 10 > (swipe_count - new_swipes) // 10:
+            update_user_preferences(user_id)
+            preferences_updated = True
+    
+    return {
+        "status": "success",
+        "message": f"{len(batch.swipes)} swipes recorded",
+        "recorded": len(batch.swipes),
+        "preferences_updated": preferences_updated
+    }
+
+
 @router.get("/user/preferences/{user_id}")
 async def get_user_preferences(user_id: int, db: Session = Depends(get_db)):
     """
@@ -227,6 +257,7 @@ async def remove_liked_song(user_id: int, song_id: str, db: Session = Depends(ge
         db.delete(swipe)
     
     db.commit()
+    invalidate_user_swipes(user_id)
     logger.info(f"Deleted {len(swipes)} liked song record(s) for user {user_id}, song {song_id}")
     
     return {
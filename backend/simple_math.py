@@ -4,7 +4,7 @@ No NumPy/SciPy dependencies - works on all systems!
 """
 
 import math
-from typing import List
+from typing import List, Optional, Tuple
 
 
 def dot_product(vec_a: List[float], vec_b: List[float]) -> float:
@@ -64,6 +64,44 @@ def manhattan_similarity(vec_a: List[float], vec_b: List[float]) -> float:
     return 1 / (1 + distance)
 
 
+def similarity_triple(
+    vec_a: List[float],
+    vec_b: List[float],
+    mag_a: Optional[float] = None
+) -> Tuple[float, float, float]:
+    """
+    Cosine, Euclidean and Manhattan similarity in a single pass over both vectors
+    (same results as the three functions above, sharing the per-element differences)
+    Pass `mag_a` (magnitude(vec_a)) when comparing one seed against many candidates
+    """
+    try:
+        dot = sq_b = sq_diff = abs_diff = 0.0
+        for a, b in zip(vec_a, vec_b):
+            diff = a - b
+            dot += a * b
+            sq_b += b * b
+            sq_diff += diff * diff
+            abs_diff += abs(diff)
+    except (TypeError, ValueError):
+        # Non-numeric input - keep each measure's own fallback
+        return (
+            cosine_similarity(vec_a, vec_b),
+            euclidean_similarity(vec_a, vec_b),
+            manhattan_similarity(vec_a, vec_b)
+        )
+    
+    if mag_a is None:
+        mag_a = magnitude(vec_a)
+    mag_b = math.sqrt(sq_b)
+    
+    if mag_a == 0 or mag_b == 0:
+        cosine = 0.0
+    else:
+        cosine = max(0.0, min(1.0, dot / (mag_a * mag_b)))
+    
+    return cosine, 1 / (1 + math.sqrt(sq_diff)), 1 / (1 + abs_diff)
+
+
 def mean(values: List[float]) -> float:
     """Calculate mean of a list"""
     if not values:
@@ -1,8 +1,13 @@
 import spotipy
+from spotipy.exceptions import SpotifyException
 from spotipy.oauth2 import SpotifyClientCredentials
 from config import settings
-from typing import List, Dict, Optional
+from http_session import create_session
+from typing import Any, Callable, List, Dict, Optional
 import logging
+import random
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +27,15 @@ def get_audio_analyzer():
 
 
 class SpotifyClient:
+    # Spotify rate limits (429 + Retry-After) apply to the whole app, so a 429 seen by any
+    # thread pauses every call until Retry-After passes instead of each retrying on its own
+    RATE_LIMIT_ATTEMPTS = 3
+    MAX_RATE_LIMIT_WAIT = 30  # seconds - longer bans fail fast instead of blocking request threads
+    
     def __init__(self):
+        self._retry_until = 0.0
+        self._retry_lock = threading.Lock()
+        
         if not settings.spotify_client_id or not settings.spotify_client_secret:
             logger.warning("Spotify credentials not set. Please configure SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET in .env")
             self.client = None
@@ -32,18 +45,49 @@ class SpotifyClient:
                     client_id=settings.spotify_client_id,
                     client_secret=settings.spotify_client_secret
                 )
-                self.client = spotipy.Spotify(auth_manager=auth_manager)
+                # Server errors are still retried by the adapter, 429s come back to _call
+                self.client = spotipy.Spotify(
+                    auth_manager=auth_manager,
+                    requests_session=create_session(retry_status_codes=[500, 502, 503, 504])
+                )
             except Exception as e:
                 logger.error(f"Failed to initialize Spotify client: {e}")
                 self.client = None
     
+    def _call(self, method: Callable, *args, **kwargs) -> Any:
+        """Call a spotipy method behind the shared rate-limit gate, retrying 429s"""
+        for attempt in range(self.RATE_LIMIT_ATTEMPTS):
+            wait = self._retry_until - time.monotonic()
+            if wait > self.MAX_RATE_LIMIT_WAIT:
+                raise SpotifyException(429, -1, f"Rate limited by Spotify for another {wait:.0f}s")
+            if wait > 0:
+                time.sleep(wait)
+            
+            try:
+                return method(*args, **kwargs)
+            except SpotifyException as e:
+                if e.http_status != 429 or attempt == self.RATE_LIMIT_ATTEMPTS - 1:
+                    raise
+                self._back_off(e, attempt)
+    
+    def _back_off(self, error: SpotifyException, attempt: int):
+        """Close the gate for Retry-After seconds (capped exponential backoff with jitter if absent)"""
+        try:
+            delay = float((error.headers or {}).get('Retry-After'))
+        except (TypeError, ValueError):
+            delay = min(2 ** attempt + random.random(), self.MAX_RATE_LIMIT_WAIT)
+        
+        with self._retry_lock:
+            self._retry_until = max(self._retry_until, time.monotonic() + delay)
+        logger.warning(f"⏳ Spotify rate limited, pausing requests for {delay:.1f}s")
+    
     def search_tracks(self, query: str, limit: int = 20) -> List[Dict]:
         """Search for tracks by song name or artist"""
         if not self.client:
             return []
         
         try:
-            results = self.client.search(q=query, type='track', limit=limit)
+            results = self._call(self.client.search, q=query, type='track', limit=limit)
             tracks = []
             
             for item in results['tracks']['items']:
@@ -72,7 +116,7 @@ class SpotifyClient:
             return None
         
         try:
-            track = self.client.track(track_id)
+            track = self._call(self.client.track, track_id)
             return {
                 'id': track['id'],
                 'name': track['name'],
@@ -136,13 +180,37 @@ class SpotifyClient:
                 'key': 0
             }
     
+    def get_audio_features_batch(self, tracks: List[Dict]) -> List[Optional[Dict]]:
+        """
+        get_audio_features for many tracks at once (dicts with 'name' and 'artist', e.g. recommendations)
+        Skips the per-track Spotify lookup and queries the fusion sources in bulk; same order as `tracks`
+        """
+        if not tracks:
+            return []
+        
+        if not self.client:
+            return [None] * len(tracks)
+        
+        try:
+            from feature_fusion import feature_fusion
+            
+            batch = feature_fusion.get_fused_features_batch(tracks)
+        except Exception as e:
+            logger.error(f"Batch feature fusion failed for {len(tracks)} tracks: {e}")
+            return [None] * len(tracks)
+        
+        for features in batch:
+            features.pop('_sources_used', None)
+            features.pop('_num_sources', None)
+        return batch
+    
     def get_artist_genres(self, artist_id: str) -> List[str]:
         """Get genres for an artist"""
         if not self.client:
             return []
         
         try:
-            artist = self.client.artist(artist_id)
+            artist = self._call(self.client.artist, artist_id)
             return artist.get('genres', [])
         except Exception as e:
             logger.error(f"Error getting artist genres for {artist_id}: {e}")
@@ -154,7 +222,8 @@ class SpotifyClient:
             return []
         
         try:
-            recommendations = self.client.recommendations(
+            recommendations = self._call(
+                self.client.recommendations,
                 seed_tracks=seed_tracks[:5] if seed_tracks else None,
                 seed_artists=seed_artists[:5] if seed_artists else None,
                 limit=limit
@@ -186,7 +255,7 @@ class SpotifyClient:
             return []
         
         try:
-            related = self.client.artist_related_artists(artist_id)
+            related = self._call(self.client.artist_related_artists, artist_id)
             return [artist['id'] for artist in related['artists']]
         except Exception as e:
             logger.error(f"Error getting related artists for {artist_id}: {e}")
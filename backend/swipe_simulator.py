@@ -9,7 +9,7 @@ import sys
 import time
 from typing import List, Dict
 from spotify_client import spotify_client
-from progressive_recommendations import get_fast_recommendations
+from progressive_recommendations import get_fast_recommendations, invalidate_user_swipes
 from recommendation_engine import update_user_preferences
 from database import SessionLocal, SwipeHistory, User, UserPreferences, init_db
 
@@ -204,6 +204,7 @@ while current_index < len(recommendations):
             )
             db.add(swipe_record)
             db.commit()
+            invalidate_user_swipes(test_user.id)
             
             swipe_history.append({
                 'direction': direction,
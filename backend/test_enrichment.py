@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Background Enrichment Test
+Enriching a fast recommendation batch must attach audio features and rescore the tracks
+against the seed's features and tags
+Run: python test_enrichment.py (or pytest test_enrichment.py)
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+# Point the persistent feature cache at a throwaway file before the clients are imported
+_cache_dir = tempfile.mkdtemp()
+os.environ['FEATURE_CACHE_PATH'] = os.path.join(_cache_dir, 'feature_cache.db')
+
+import progressive_recommendations
+from progressive_recommendations import enrich_batch_async, enrich_batch_for_seed
+
+SEED_FEATURES = {
+    'acousticness': 0.1, 'danceability': 0.8, 'energy': 0.9, 'instrumentalness': 0.0,
+    'liveness': 0.1, 'loudness': -5.0, 'speechiness': 0.05, 'tempo': 128.0, 'valence': 0.7
+}
+FAR_FEATURES = {
+    'acousticness': 0.9, 'danceability': 0.2, 'energy': 0.1, 'instrumentalness': 0.9,
+    'liveness': 0.8, 'loudness': -25.0, 'speechiness': 0.6, 'tempo': 70.0, 'valence': 0.1
+}
+
+
+def _track(track_id: str, tags):
+    return {
+        'id': track_id,
+        'similarity_score': 0.5,
+        '_needs_enrichment': True,
+        'metadata': {
+            'genres': tags,
+            'lastfm_tags': [],
+            'lastfm_similarity': 0.5,
+            'release_year': 2020,
+            'popularity': 60
+        }
+    }
+
+
+class EnrichmentTest(unittest.TestCase):
+
+    def _enrich(self, tracks, features, **kwargs):
+        with mock.patch.object(progressive_recommendations.spotify_client, 'get_audio_features_batch', return_value=features):
+            enrich_batch_async(tracks, **kwargs)
+
+    def test_features_rescore_tracks(self):
+        close, far = _track('close', ['house']), _track('far', ['house'])
+
+        self._enrich([close, far], [dict(SEED_FEATURES), dict(FAR_FEATURES)], seed_features=SEED_FEATURES, seed_tags=['house'])
+
+        self.assertEqual(close['audio_features'], SEED_FEATURES)
+        self.assertFalse(close['_needs_enrichment'])
+        self.assertNotEqual(close['similarity_score'], 0.5)
+        self.assertGreater(close['similarity_score'], far['similarity_score'])
+
+    def test_seed_tags_drive_tag_score(self):
+        shared, unrelated = _track('shared', ['house', 'techno']), _track('unrelated', ['folk'])
+
+        self._enrich([shared, unrelated], [dict(SEED_FEATURES), dict(SEED_FEATURES)], seed_features=SEED_FEATURES, seed_tags=['House', 'techno'])
+
+        # Same features - only the tag overlap differs
+        self.assertGreater(shared['similarity_score'], unrelated['similarity_score'])
+
+    def test_without_seed_only_features_are_attached(self):
+        track = _track('track', ['house'])
+
+        self._enrich([track], [dict(SEED_FEATURES)])
+
+        self.assertEqual(track['audio_features'], SEED_FEATURES)
+        self.assertEqual(track['similarity_score'], 0.5)
+
+    def test_enrich_for_seed_looks_up_seed(self):
+        client = progressive_recommendations.spotify_client
+        seed = {'id': 'seed', 'name': 'Seed', 'artist': 'Artist', 'artist_ids': ['a1']}
+        track = _track('track', ['house'])
+
+        with mock.patch.object(client, 'get_track', return_value=seed), \
+                mock.patch.object(client, 'get_audio_features', return_value=SEED_FEATURES), \
+                mock.patch.object(client, 'get_artist_genres', return_value=['house']), \
+                mock.patch.object(progressive_recommendations.lastfm_client, 'get_track_tags', return_value=['dance']), \
+                mock.patch.object(progressive_recommendations, 'enrich_batch_async') as enrich:
+            enrich_batch_for_seed([track], 'seed')
+
+        enrich.assert_called_once_with([track], 10, seed_features=SEED_FEATURES, seed_tags=['house', 'dance'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Stale-If-Error Test
+A feature lookup that fails at the transport level (or with a 5xx) must serve the last
+cached value instead of caching the outage as a miss
+Run: python test_stale_if_error.py (or pytest test_stale_if_error.py)
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+# Point the persistent feature cache at a throwaway file before feature_fusion is imported
+_cache_dir = tempfile.mkdtemp()
+os.environ['FEATURE_CACHE_PATH'] = os.path.join(_cache_dir, 'feature_cache.db')
+
+import requests
+import feature_fusion
+from feature_fusion import FeatureFusion
+from lookup_cache import MISSING, normalize_key
+
+
+def _response(status_code: int) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = 'https://api.deezer.com/search'
+    response._content = b'{"data": []}'
+    return response
+
+
+class StaleIfErrorTest(unittest.TestCase):
+    STALE = {'tempo': 100.0, 'energy': 0.3, 'danceability': 0.36, 'source': 'deezer'}
+
+    def setUp(self):
+        self.fetch = FeatureFusion.fetch_deezer_features
+        self.fetch.cache.clear()
+        feature_fusion._breakers['deezer'].record_success()
+
+    def _seed_expired_entry(self, track: str, artist: str):
+        # Negative TTL: already expired, so only get_stale() can see it
+        self.fetch.cache.set(normalize_key(track, artist), self.STALE, ttl=-1)
+
+    def test_transport_error_serves_stale_value(self):
+        self._seed_expired_entry('Stale Song', 'Stale Artist')
+
+        with mock.patch.object(feature_fusion._session, 'get', side_effect=requests.ConnectionError('down')):
+            result = self.fetch('Stale Song', 'Stale Artist')
+
+        self.assertEqual(result, self.STALE)
+        # The outage itself isn't cached - the next call goes back to the network
+        self.assertIs(self.fetch.cache.get(normalize_key('Stale Song', 'Stale Artist')), MISSING)
+
+    def test_server_error_serves_stale_value(self):
+        self._seed_expired_entry('Stale Song', 'Stale Artist')
+
+        with mock.patch.object(feature_fusion._session, 'get', return_value=_response(503)):
+            result = self.fetch('Stale Song', 'Stale Artist')
+
+        self.assertEqual(result, self.STALE)
+
+    def test_transport_error_without_stale_value_raises(self):
+        with mock.patch.object(feature_fusion._session, 'get', side_effect=requests.ConnectionError('down')):
+            with self.assertRaises(requests.ConnectionError):
+                self.fetch('Unknown Song', 'Unknown Artist')
+
+        self.assertIs(self.fetch.cache.get(normalize_key('Unknown Song', 'Unknown Artist')), MISSING)
+
+    def test_not_found_is_cached_as_miss(self):
+        with mock.patch.object(feature_fusion._session, 'get', return_value=_response(200)):
+            self.assertIsNone(self.fetch('Missing Song', 'Missing Artist'))
+
+        self.assertIsNone(self.fetch.cache.get(normalize_key('Missing Song', 'Missing Artist')))
+
+
+if __name__ == '__main__':
+    unittest.main()